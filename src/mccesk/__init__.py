@@ -0,0 +1,62 @@
+"""Package `mccesk`: MCCE Scientific Toolkit.
+
+Submodules are loaded on first attribute access (PEP 562) so that
+`import mccesk` stays cheap for short CLI calls and pool workers:
+ - base
+ - constants
+ - mcce_io
+ - ms_export
+ - ms_histogram
+ - ms_resampling
+ - ms_sampling
+ - ms_stats
+ - ms_trajectory
+
+The main classes are also available at the package level:
+ - Conformer, Microstate, MS (from `base`)
+"""
+
+import importlib
+
+from ._version import __version__
+
+
+_SUBMODULES = {
+    "base",
+    "constants",
+    "mcce_io",
+    "ms_export",
+    "ms_histogram",
+    "ms_resampling",
+    "ms_sampling",
+    "ms_stats",
+    "ms_trajectory",
+}
+
+# name -> submodule holding it:
+_LAZY_ATTRS = {
+    "Conformer": "base",
+    "Microstate": "base",
+    "MS": "base",
+}
+
+__all__ = ["__version__"] + sorted(_SUBMODULES) + sorted(_LAZY_ATTRS)
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
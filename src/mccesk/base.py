@@ -0,0 +1,583 @@
+"""Module `base` Contains all classes for creating MCCE objects:
+ - Conformer
+ - Microstate
+ - MS
+
+"""
+
+from pathlib import Path
+from typing import Union
+import numpy as np
+import zlib
+from . import mcce_io as io
+from . import constants as cst
+
+
+class Conformer:
+    def __init__(self):
+        self.iconf = 0
+        self.confid = ""
+        self.resid = ""
+        self.crg = 0.0
+        self.ne = 0
+        self.nh = 0
+
+    def load_from_head3lst(self, line):
+        fields = line.split()
+        self.iconf = int(fields[0]) - 1
+        self.confid = fields[1]
+        self.resid = self.confid[:3] + self.confid[5:11]
+        self.crg = float(fields[4])
+        self.ne = int(fields[7])
+        self.nh = int(fields[8])
+
+
+class Microstate:
+    def __init__(self, state, E, count):
+        self.stateid = zlib.compress(" ".join([str(x) for x in state]).encode())
+        self.E = E
+        self.count = count
+
+    def state(self):
+        return [int(i) for i in zlib.decompress(self.stateid).decode().split()]
+
+
+class MS:
+    """Uses split ms_out files."""
+
+    def __init__(
+        self,
+        mcce_output_path: str,
+        pH: Union[int, float],
+        Eh: Union[int, float],
+        selected_MC: int = 0,
+        overwrite_split_files: bool = False,
+        load_mc_data: bool = True,
+    ):
+        """MS.init
+
+        Parameters:
+            mcce_output_path (str): A MCCE simulation output folder.
+            pH (int or float): A pH point.
+            Eh (int or float): A Eh point.
+            selected_MC (int): The index of an MC run; one of `range(constants.MONTERUNS)`.
+            overwrite_split_files (bool): whether to redo the splitting of msout_file.
+            load_mc_data (bool): whether to load the MC records into `microstates`;
+                                 if False, only the conformers and header data are loaded.
+        """
+
+        self._init_attributes(
+            mcce_output_path, pH, Eh, selected_MC, overwrite_split_files
+        )
+
+        self.fname = io.get_msout_filename(self.mcce_out, self.pH, self.Eh)
+        self.msout_file_dir, created = io.mkdir_from_msout_file(self.fname)
+        if created:
+            io.split_msout_file(self.mcce_out, self.pH, self.Eh)
+        elif self.overwrite_split_files:
+            io.clear_folder(self.msout_file_dir)
+            io.split_msout_file(self.mcce_out, self.pH, self.Eh)
+
+        if load_mc_data:
+            self._get_data()
+        else:
+            self._get_conformer_data()
+            self._get_header_data()
+            self._conf_counts = np.zeros(len(self.conformers))
+
+    def _init_attributes(
+        self,
+        mcce_output_path: str,
+        pH: Union[int, float],
+        Eh: Union[int, float],
+        selected_MC: int = 0,
+        overwrite_split_files: bool = False,
+    ):
+        """Set all instance variables to their defaults without reading any file.
+        Also used to rebuild an instance from exported tables (see `ms_export`).
+        """
+
+        self.mcce_out = Path(mcce_output_path)
+        self.selected_MC = selected_MC
+        self.overwrite_split_files = overwrite_split_files
+        self.T = cst.ROOMT
+        self.pH = pH
+        self.Eh = Eh
+        self.method = ""
+        self.conformers = []
+        self.iconf_by_confname = {}
+        self.fixed_iconfs = []
+        self.fixed_residue_names = []
+        self.fixed_crg = 0.0
+        self.fixed_ne = 0.0
+        self.fixed_nh = 0.0
+        self.free_residues = []  # free residues, referred by conformer indices
+        self.free_residue_names = []
+        self.ires_by_iconf = {}  # index of free residue by index of conf
+
+        self.microstates = []  # list of unique microstates
+        self.counts = 0  # number of Monte Carlo steps:: redundant: already in run.prm
+        # running state of the selected MC block, used by `refresh`:
+        self._microstates_by_id = {}
+        self._current_state = []
+        self._conf_counts = None  # count-weighted conformer totals
+        self._n_records = 0  # MC records parsed so far
+        self._mc_offset = None  # byte offset in msout file past the last parsed record
+        self._mc_done = False  # True once the next "MC:" line was reached
+        # lazily built arrays over `microstates`, see `_get_sort_index`:
+        self._ms_energies = None
+        self._ms_counts = None
+        self._ms_states = None
+        self._sort_index = {}
+        self._sorted_energies = None
+        # self.microstates_by_id = {}  # dict
+        # self.N_ms = 0
+        # self.N_uniq = 0
+        self.fname = None
+        self.msout_file_dir = None
+
+        return
+
+    def __repr__(self):
+        return f"""{type(self).__name__}("{self.mcce_out}", {self.pH}, {self.Eh}, selected_MC={self.selected_MC}, overwrite_split_files={self.overwrite_split_files})"""
+
+    def _get_conformer_data(self):
+        """Populate class vars: conformers, iconf_by_confname."""
+        head3_path = self.mcce_out.joinpath("head3.lst")
+        io.check_path(head3_path)
+        self.conformers, self.iconf_by_confname = io.read_conformers(head3_path)
+
+        return
+
+    def _get_header_data(self):
+        """Populate class vars: T, pH, Eh, method, fixed_iconfs, free_residues,
+        free_residue_names, and ires_by_iconf.
+        """
+
+        steps_done = {"exper": False, "method": False, "fixed": False, "free": False}
+
+        header_file = self.msout_file_dir.joinpath("header")
+        with open(header_file) as fh:
+            for nl, line in enumerate(fh):
+                if not steps_done["exper"]:
+                    fields = line.split(",")
+                    for field in fields:
+                        parts = field.split(":")
+                        key = parts[0].upper().strip()
+                        try:
+                            value = float(parts[1])
+                        except ValueError:
+                            print(
+                                f"Unrecognized experimental value \
+                                  (number expected), found: '{parts[1]}')."
+                            )
+                        if key == "T":
+                            self.T = value
+                        elif key == "PH":
+                            self.pH = value
+                        elif key == "EH":
+                            self.Eh = value
+                        else:
+                            raise ValueError(
+                                f"Unrecognized experimental condition part: {key}"
+                            )
+                    steps_done["exper"] = True
+                    continue
+
+                if not steps_done["method"]:
+                    key, value = line.split(":")
+                    if (
+                        key.strip() != "METHOD"
+                        or value.strip() not in cst.VALID_MC_METHODS
+                    ):
+                        raise ValueError(
+                            f"""This file: {fname} is not a valid Monte Carlo microstate file or the method is unknown.
+                            Supported methods are: {cst_VALID_MC_METHODS}."""
+                        )
+                    self.method = value.strip()
+                    steps_done["method"] = True
+                    continue
+
+                if not steps_done["fixed"]:
+                    _, fields = line.split(":")
+                    self.fixed_iconfs = [int(x) for x in fields.strip("\n").split()]
+                    # TODO: check this:
+                    self.fixed_residue_names = [
+                        self.conformers[fc].resid for fc in self.fixed_iconfs
+                    ]
+                    steps_done["fixed"] = True
+                    continue
+
+                if not steps_done["free"]:
+                    n_res, fres = line.split(":")
+                    self.free_residues = [
+                        [int(n) for n in grp.strip().split()]
+                        for grp in fres.strip(" ;\n").split(";")
+                    ]
+                    if len(self.free_residues) != int(n_res):
+                        msg = "Mismatch between the number of free residues indicator"
+                        msg = (
+                            msg
+                            + " and the number of residues listed on the same line.\n"
+                        )
+                        raise ValueError(msg + f"\t{line}")
+
+                    self.free_residue_names = [
+                        self.conformers[g[0]].resid for g in self.free_residues
+                    ]
+                    for ires, res in enumerate(self.free_residues):
+                        for iconf in res:
+                            self.ires_by_iconf[iconf] = ires
+                    steps_done["fee"] = True
+
+        return
+
+    def _add_mc_record(self, state_e: float, count: int, flipped: list):
+        """Apply the flipped conformers of a MC record to the current state and
+        merge the resulting microstate into the unique microstates and counts.
+        """
+
+        for ic in flipped:
+            self._current_state[self.ires_by_iconf[ic]] = ic
+
+        ms = Microstate(self._current_state, state_e, count)
+        if ms.stateid in self._microstates_by_id:
+            self._microstates_by_id[ms.stateid].count += ms.count
+        else:
+            self._microstates_by_id[ms.stateid] = ms
+            self.microstates.append(ms)
+        self.counts += ms.count
+        # one conformer per free residue: no repeated indices
+        self._conf_counts[self._current_state] += ms.count
+        self._n_records += 1
+
+        return
+
+    def _get_mc_data(self):
+        """Populate class vars microstates with the data in a MC file identified
+        in `self.selected_MC`.
+        """
+
+        self._conf_counts = np.zeros(len(self.conformers))
+        MC_file = self.msout_file_dir.joinpath(f"MC{self.selected_MC}")
+
+        with open(MC_file) as fh:
+            for nl, line in enumerate(fh):
+                line = line.strip()
+
+                if nl == 0:
+                    _, confs = line.split(":")
+                    self._current_state = [int(c) for c in confs.split()]
+                    if not self._current_state:
+                        msg = "The current ms state line cannot be empty.\n"
+                        msg = msg + f"\tProblem line in {MC_file}: {nl}"
+                        raise ValueError(msg)
+                    continue
+
+                if line.startswith("MC:"):
+                    self._mc_done = True
+                    continue
+
+                fields = line.split(",")
+                if len(fields) >= 3:
+                    self._add_mc_record(
+                        float(fields[0]),
+                        int(fields[1]),
+                        [int(c) for c in fields[2].split()],
+                    )
+        self._reset_ms_index()
+
+        return
+
+    def _locate_mc_offset(self) -> Union[int, None]:
+        """Return the byte offset in the msout file just past the MC records
+        already parsed for `self.selected_MC`, or None if its block has not
+        started yet.
+        """
+
+        mc_line = f"MC:{self.selected_MC}".encode()
+        in_block = False
+        seen_state = False
+        n_records = 0
+        offset = 0
+
+        with open(self.fname, "rb") as fh:
+            for raw in fh:
+                offset += len(raw)
+                line = raw.strip()
+                if not in_block:
+                    in_block = line == mc_line
+                    if in_block and not self._current_state:
+                        return offset
+                    continue
+                if not line or line.startswith(b"#"):
+                    continue
+                if not seen_state:
+                    seen_state = True
+                    if self._n_records == 0:
+                        return offset
+                    continue
+                if len(line.split(b",")) >= 3:
+                    n_records += 1
+                    if n_records == self._n_records:
+                        return offset
+
+        if not in_block:
+            return None
+        if n_records < self._n_records:
+            raise ValueError(
+                f"{self.fname} has fewer MC{self.selected_MC} records ({n_records})"
+                + f" than already parsed ({self._n_records})."
+            )
+
+        return offset
+
+    def refresh(self) -> int:
+        """Parse the MC records appended to the msout file since the last load
+        or refresh, e.g. while MCCE step 4 is still running.
+        The new records are merged into `microstates`, `counts` and the running
+        conformer counts (see `get_running_occ`); the split files are not rewritten.
+
+        Returns:
+            int: The number of new MC records parsed.
+        """
+
+        if self._mc_done:
+            return 0
+        if self._mc_offset is None:
+            self._mc_offset = self._locate_mc_offset()
+            if self._mc_offset is None:
+                return 0
+
+        n_before = self._n_records
+        with open(self.fname, "rb") as fh:
+            fh.seek(self._mc_offset)
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    # line still being written
+                    break
+                self._mc_offset += len(raw)
+                line = raw.decode().strip()
+                if not line or line[0] == "#":
+                    continue
+                if line.startswith("MC:"):
+                    self._mc_done = True
+                    break
+                if not self._current_state:
+                    _, confs = line.split(":")
+                    self._current_state = [int(c) for c in confs.split()]
+                    continue
+
+                fields = line.split(",")
+                if len(fields) >= 3:
+                    self._add_mc_record(
+                        float(fields[0]),
+                        int(fields[1]),
+                        [int(c) for c in fields[2].split()],
+                    )
+
+        n_new = self._n_records - n_before
+        if n_new:
+            self._reset_ms_index()
+
+        return n_new
+
+    def _reset_ms_index(self):
+        """Drop the energy and count arrays and sort indices; rebuilt on demand."""
+
+        self._ms_energies = None
+        self._ms_counts = None
+        self._ms_states = None
+        self._sort_index = {}
+        self._sorted_energies = None
+
+        return
+
+    def get_ms_arrays(self) -> tuple:
+        """Return the energies and counts of `microstates` as arrays."""
+
+        if self._ms_energies is None:
+            self._ms_energies = np.fromiter(
+                (ms.E for ms in self.microstates), float, len(self.microstates)
+            )
+            self._ms_counts = np.fromiter(
+                (ms.count for ms in self.microstates), np.int64, len(self.microstates)
+            )
+
+        return self._ms_energies, self._ms_counts
+
+    def get_state_array(self) -> np.ndarray:
+        """Return the states of `microstates` as a 2D array:
+        one row per microstate, one column per free residue.
+        """
+
+        if self._ms_states is None:
+            states = np.empty(
+                (len(self.microstates), len(self.free_residues)), dtype=np.int32
+            )
+            for i, ms in enumerate(self.microstates):
+                states[i] = ms.state()
+            self._ms_states = states
+
+        return self._ms_states
+
+    def _get_sort_index(self, by: str) -> np.ndarray:
+        """Return the indices sorting `microstates` by ascending 'energy'
+        or descending 'count'.
+        """
+
+        if by not in self._sort_index:
+            energies, counts = self.get_ms_arrays()
+            values = energies if by == "energy" else -counts
+            self._sort_index[by] = np.argsort(values, kind="stable")
+
+        return self._sort_index[by]
+
+    def get_sorted_microstates(self, by: str = "energy") -> list:
+        """Return `microstates` sorted by ascending 'energy' or descending 'count',
+        ties in list order; the sort index is built once and cached.
+        """
+
+        by = by.lower()
+        if by not in ["energy", "count"]:
+            raise ValueError(f"Values for `by` are 'energy' or 'count'; Given: {by}")
+
+        return [self.microstates[i] for i in self._get_sort_index(by)]
+
+    def top_k(self, by: str = "energy", k: int = 1) -> list:
+        """Return the `k` lowest energy or most populated microstates; same order
+        as `get_sorted_microstates(by)[:k]`, ties in list order.
+
+        Args:
+            by (str): Either 'energy' (lowest first) or 'count' (largest first).
+            k (int): Number of microstates to return.
+        Returns:
+            list: Microstates, in order.
+        """
+
+        by = by.lower()
+        if by not in ["energy", "count"]:
+            raise ValueError(f"Values for `by` are 'energy' or 'count'; Given: {by}")
+
+        energies, counts = self.get_ms_arrays()
+        k = min(max(k, 0), len(energies))
+        if k == 0:
+            return []
+
+        if by in self._sort_index:
+            idx = self._sort_index[by][:k]
+        else:
+            values = energies if by == "energy" else -counts
+            kth = values[np.argpartition(values, k - 1)[k - 1]]
+            # all values below the k-th one, then the first ties by position:
+            below = np.flatnonzero(values < kth)
+            ties = np.flatnonzero(values == kth)[: k - len(below)]
+            idx = np.concatenate((below, ties))
+            idx = idx[np.lexsort((idx, values[idx]))]
+
+        return [self.microstates[i] for i in idx]
+
+    def select_by_energy_window(self, low: float, high: float) -> list:
+        """Return the microstates with `low` <= energy < `high`, sorted by energy.
+        Uses a binary search on the sorted energies of `microstates`.
+        """
+
+        idx = self._get_sort_index("energy")
+        if self._sorted_energies is None:
+            energies, _ = self.get_ms_arrays()
+            self._sorted_energies = energies[idx]
+        lo, hi = np.searchsorted(self._sorted_energies, sorted([low, high]))
+
+        return [self.microstates[i] for i in idx[lo:hi]]
+
+    def _get_data(self):
+        """Populate class variables from head3.lst, header and MC records files."""
+        self._get_conformer_data()
+        self._get_header_data()
+        self._get_mc_data()
+
+        return
+
+    def get_occ(self, microstates: list) -> list:
+        """Return the average occupancy of conformers in each microstates."""
+
+        conf_occ = np.zeros(len(self.conformers))
+        total_counts = 0
+        for ms in microstates:
+            total_counts += ms.count
+            for iconf in ms.state():
+                conf_occ[iconf] += ms.count
+
+        return (conf_occ / total_counts).tolist()
+
+    def get_running_occ(self) -> list:
+        """Return the average occupancy of conformers over all the MC records
+        parsed so far; kept up to date by `refresh` without a pass over `microstates`.
+        """
+
+        if not self.counts:
+            return [0.0] * len(self.conformers)
+
+        return (self._conf_counts / self.counts).tolist()
+
+    def confnames_by_iconfs(self, iconfs):
+        """Return the conformers id given their indices."""
+
+        return [self.conformers[ic].confid for ic in list(iconfs)]
+
+    def select_by_conformer(
+        self, microstates: list, conformer_selection: list = None
+    ) -> tuple:
+        """Select microstates with confomers in conformer_selection list.
+        Args:
+            microstates (list): List of microstates.
+            conformer_selection (list): List of conformers.
+        Returns:
+            tuple: selected, unselected; if `conformer_selection` is empty,
+            returns [], microstates.
+        """
+
+        selected = []
+        unselected = []
+        if conformer_selection is None:
+            return selected, microstates
+
+        iconf_in = {self.iconf_by_confname[confid] for confid in conformer_selection}
+        for ms in microstates:
+            if set(ms.state()) & iconf_in:
+                selected.append(ms)
+            else:
+                unselected.append(ms)
+
+        return selected, unselected
+
+    def select_by_energy(self, microstates: list, energy_range: list = None) -> tuple:
+        """Select microstates if their energies is in the range given in `energy_range`.
+
+        Args:
+            microstates (list): List of microstates.
+            energy_range (list):  [low, high].
+        Returns:
+            tuple: selected, unselected; if `energy_range` is empty,
+            returns [], microstates.
+        """
+
+        if len(energy_range) != 2:
+            print(
+                f"Provide two values for `energy_range`= [low, high]; invalid: {energy_range}"
+            )
+            return None, None
+
+        selected = []
+        unselected = []
+        if energy_range is None:
+            return selected, microstates
+        energy_range.sort()
+
+        for ms in microstates:
+            if energy_range[0] <= ms.E < energy_range[1]:
+                selected.append(ms)
+            else:
+                unselected.append(ms)
+
+        return selected, unselected
@@ -16,9 +16,7 @@ The module contains the following functions:
 
 from pathlib import Path
 from typing import Union
-import numpy as np
-import base
-import constants as cst
+from . import constants as cst
 
 
 def mcce_pdb2pdb(fname):
@@ -93,6 +91,9 @@ def read_conformers(head_3_path: str) -> tuple:
     Used by base.MS class.
     """
 
+    # Imported here: `base` imports this module at load time.
+    from .base import Conformer
+
     check_path(head_3_path)
     conformers = []
     iconf_by_confname = {}
@@ -104,7 +105,7 @@ def read_conformers(head_3_path: str) -> tuple:
             if len(line) <= 80:
                 continue
 
-            conf = base.Conformer()
+            conf = Conformer()
             conf.load_from_head3lst(line)
             conformers.append(conf)
             iconf_by_confname[conf.confid] = nl
@@ -221,18 +222,41 @@ def split_msout_file(
         )
         return
 
-    steps_done = {"exper": False, "method": False, "fixed": False, "free": False}
     MC_done = dict((i, False) for i in range(cst.MONTE_RUNS))
 
     header_file = msout_file_dir.joinpath("header")
     header = open(header_file, "w")
     # open files for each MC records:: MCi
+    MC_files = {}
     for k in MC_done.keys():
         p = msout_file_dir.joinpath(f"MC{k}")
-        globals()[f"MC{k}"] = open(p, "w")
+        MC_files[k] = open(p, "w")
+
+    # all files are closed on every exit path, including an incomplete last line,
+    # so that the split files hold every record parsed:
+    try:
+        _split_msout_lines(fname, header, MC_files, MC_done)
+    finally:
+        header.close()
+        for MC in MC_files.values():
+            MC.close()
+
+    return
+
+
+def _split_msout_lines(fname: Path, header, MC_files: dict, MC_done: dict):
+    """Write the lines of the msout file `fname` into the open `header` and
+    MCi files of `split_msout_file`.
+    """
+
+    steps_done = {"exper": False, "method": False, "fixed": False, "free": False}
 
     with open(fname) as fh:
         for nl, line in enumerate(fh):
+            if not line.endswith("\n"):
+                # incomplete last line: the msout file is still being written;
+                # it will be read by base.MS.refresh
+                break
             line = line.strip()
             if not line:
                 continue
@@ -270,48 +294,46 @@ def split_msout_file(
                 continue
 
             if line.startswith("MC:0"):
-                header.close()
                 continue
 
             if not MC_done[0]:
-                MC0.write(line + "\n")
+                MC_files[0].write(line + "\n")
                 if line.startswith("MC:1"):
                     MC_done[0] = True
-                    MC0.close()
+                    MC_files[0].close()
                 continue
 
             if not MC_done[1]:
-                MC1.write(line + "\n")
+                MC_files[1].write(line + "\n")
                 if line.startswith("MC:2"):
                     MC_done[1] = True
-                    MC1.close()
+                    MC_files[1].close()
                 continue
 
             if not MC_done[2]:
-                MC2.write(line + "\n")
+                MC_files[2].write(line + "\n")
                 if line.startswith("MC:3"):
                     MC_done[2] = True
-                    MC2.close()
+                    MC_files[2].close()
                 continue
 
             if not MC_done[3]:
-                MC3.write(line + "\n")
+                MC_files[3].write(line + "\n")
                 if line.startswith("MC:4"):
                     MC_done[3] = True
-                    MC3.close()
+                    MC_files[3].close()
                 continue
 
             if not MC_done[4]:
-                MC4.write(line + "\n")
+                MC_files[4].write(line + "\n")
                 if line.startswith("MC:5"):
                     MC_done[4] = True
-                    MC4.close()
+                    MC_files[4].close()
                 continue
 
             if not MC_done[5]:
-                MC5.write(line + "\n")
+                MC_files[5].write(line + "\n")
 
-    MC5.close()
     MC_done[5] = True
 
     return
@@ -0,0 +1,428 @@
+"""
+Module `ms_export`
+
+Export the unique microstates of a `base.MS` instance (state matrix, energies,
+counts, MC run index, pH/Eh) and its conformer table (from head3.lst) to
+columnar files, and rebuild an equivalent `base.MS` instance from them without
+the MCCE text files.
+The state matrix is decompressed and written chunk by chunk so that memory
+stays bounded.
+
+Formats:
+ - NPZ: numpy only;
+ - HDF5: requires h5py;
+ - Parquet & Arrow IPC (Feather v2): require pyarrow; the conformer table is
+   saved in a sibling file named "<stem>_conformers<suffix>".
+
+The module contains the following functions:
+ - read_arrow
+ - read_hdf5
+ - read_npz
+ - read_parquet
+ - write_arrow
+ - write_hdf5
+ - write_npz
+ - write_parquet
+"""
+
+import importlib
+import json
+import zipfile
+from pathlib import Path
+import numpy as np
+from . import base
+
+
+CHUNK_SIZE = 100_000  # number of microstates decompressed at a time
+FORMAT_VERSION = 1
+
+
+def _import_optional(name: str):
+    """Return the optional module `name` or raise an ImportError saying how to get it."""
+
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ImportError(
+            f"Package '{name.split('.')[0]}' is required for this format; install it"
+            + " with `pip install mcceSK[export]`."
+        ) from e
+
+
+def _get_metadata(ms: base.MS) -> dict:
+    """Return the (json serializable) non-tabular data of a MS instance."""
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "mcce_out": str(ms.mcce_out),
+        "fname": str(ms.fname) if ms.fname is not None else None,
+        "msout_file_dir": str(ms.msout_file_dir)
+        if ms.msout_file_dir is not None
+        else None,
+        "selected_MC": ms.selected_MC,
+        "T": ms.T,
+        "pH": ms.pH,
+        "Eh": ms.Eh,
+        "method": ms.method,
+        "fixed_iconfs": ms.fixed_iconfs,
+        "fixed_crg": ms.fixed_crg,
+        "fixed_ne": ms.fixed_ne,
+        "fixed_nh": ms.fixed_nh,
+        "free_residues": ms.free_residues,
+        "free_residue_names": ms.free_residue_names,
+        "counts": int(ms.counts),
+        "n_records": ms._n_records,
+        "mc_done": ms._mc_done,
+        "current_state": [int(ic) for ic in ms._current_state],
+    }
+
+
+def _get_conformer_table(ms: base.MS) -> dict:
+    """Return the conformers data as a dict of arrays."""
+
+    return {
+        "iconf": np.array([c.iconf for c in ms.conformers], dtype=np.int32),
+        "confid": np.array([c.confid for c in ms.conformers], dtype=str),
+        "resid": np.array([c.resid for c in ms.conformers], dtype=str),
+        "crg": np.array([c.crg for c in ms.conformers], dtype=float),
+        "ne": np.array([c.ne for c in ms.conformers], dtype=np.int32),
+        "nh": np.array([c.nh for c in ms.conformers], dtype=np.int32),
+        "key": np.array(
+            [ms.iconf_by_confname[c.confid] for c in ms.conformers], dtype=np.int32
+        ),
+    }
+
+
+def _iter_state_chunks(ms: base.MS, chunk_size: int = CHUNK_SIZE):
+    """Yield the state matrix of `ms.microstates` in blocks of `chunk_size` rows."""
+
+    n_res = len(ms.free_residues)
+    for start in range(0, len(ms.microstates), chunk_size):
+        chunk = ms.microstates[start : start + chunk_size]
+        states = np.empty((len(chunk), n_res), dtype=np.int32)
+        for i, m in enumerate(chunk):
+            states[i] = m.state()
+        yield states
+
+
+def _build_ms(meta: dict, conformer_table: dict, state_chunks, energies, counts):
+    """Return a base.MS instance from exported data.
+
+    Args:
+        meta (dict): As returned by `_get_metadata`.
+        conformer_table (dict): As returned by `_get_conformer_table`.
+        state_chunks (iterable): 2D arrays of consecutive rows of the state matrix.
+        energies, counts (array): One value per unique microstate.
+    """
+
+    ms = base.MS.__new__(base.MS)
+    ms._init_attributes(meta["mcce_out"], meta["pH"], meta["Eh"], meta["selected_MC"])
+    if meta["fname"] is not None:
+        ms.fname = Path(meta["fname"])
+    if meta["msout_file_dir"] is not None:
+        ms.msout_file_dir = Path(meta["msout_file_dir"])
+    ms.T = meta["T"]
+    ms.method = meta["method"]
+
+    for iconf, confid, resid, crg, ne, nh, key in zip(
+        conformer_table["iconf"],
+        conformer_table["confid"],
+        conformer_table["resid"],
+        conformer_table["crg"],
+        conformer_table["ne"],
+        conformer_table["nh"],
+        conformer_table["key"],
+    ):
+        conf = base.Conformer()
+        conf.iconf = int(iconf)
+        conf.confid = str(confid)
+        conf.resid = str(resid)
+        conf.crg = float(crg)
+        conf.ne = int(ne)
+        conf.nh = int(nh)
+        ms.conformers.append(conf)
+        ms.iconf_by_confname[conf.confid] = int(key)
+
+    ms.fixed_iconfs = meta["fixed_iconfs"]
+    ms.fixed_residue_names = [ms.conformers[fc].resid for fc in ms.fixed_iconfs]
+    ms.fixed_crg = meta["fixed_crg"]
+    ms.fixed_ne = meta["fixed_ne"]
+    ms.fixed_nh = meta["fixed_nh"]
+    ms.free_residues = meta["free_residues"]
+    ms.free_residue_names = meta["free_residue_names"]
+    for ires, res in enumerate(ms.free_residues):
+        for iconf in res:
+            ms.ires_by_iconf[iconf] = ires
+
+    ms._conf_counts = np.zeros(len(ms.conformers))
+    start = 0
+    for states in state_chunks:
+        n = len(states)
+        chunk_counts = np.asarray(counts[start : start + n])
+        for state, E, count in zip(
+            states.tolist(), energies[start : start + n], chunk_counts.tolist()
+        ):
+            m = base.Microstate(state, float(E), count)
+            ms._microstates_by_id[m.stateid] = m
+            ms.microstates.append(m)
+        ms._conf_counts += np.bincount(
+            states.ravel(),
+            weights=np.repeat(chunk_counts, states.shape[1]),
+            minlength=len(ms.conformers),
+        )
+        start += n
+
+    ms.counts = meta["counts"]
+    ms._n_records = meta["n_records"]
+    ms._mc_done = meta["mc_done"]
+    ms._current_state = meta["current_state"]
+
+    return ms
+
+
+# NPZ ............................................................................
+def _npz_write_array(zf: zipfile.ZipFile, name: str, arr: np.ndarray):
+    with zf.open(f"{name}.npy", "w", force_zip64=True) as fh:
+        np.lib.format.write_array(fh, np.asarray(arr), allow_pickle=False)
+
+
+def write_npz(ms: base.MS, file_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """Save the microstates and conformers of `ms` in a compressed npz file.
+    The state matrix is written into the archive chunk by chunk.
+    """
+
+    energies, counts = ms.get_ms_arrays()
+    n_ms, n_res = len(ms.microstates), len(ms.free_residues)
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        _npz_write_array(zf, "metadata", np.array(json.dumps(_get_metadata(ms))))
+        for name, arr in _get_conformer_table(ms).items():
+            _npz_write_array(zf, f"conf_{name}", arr)
+        _npz_write_array(zf, "E", energies)
+        _npz_write_array(zf, "count", counts)
+
+        with zf.open("states.npy", "w", force_zip64=True) as fh:
+            header = {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(np.int32)),
+                "fortran_order": False,
+                "shape": (n_ms, n_res),
+            }
+            np.lib.format.write_array_header_2_0(fh, header)
+            for states in _iter_state_chunks(ms, chunk_size):
+                fh.write(states.tobytes())
+
+    return
+
+
+def read_npz(file_path: str, chunk_size: int = CHUNK_SIZE) -> base.MS:
+    """Return a base.MS instance from a file created by `write_npz`."""
+
+    with np.load(file_path, allow_pickle=False) as data:
+        meta = json.loads(data["metadata"].item())
+        conformer_table = {
+            name[len("conf_") :]: data[name]
+            for name in data.files
+            if name.startswith("conf_")
+        }
+        states = data["states"]
+        energies = data["E"]
+        counts = data["count"]
+
+    state_chunks = (
+        states[start : start + chunk_size]
+        for start in range(0, len(states), chunk_size)
+    )
+
+    return _build_ms(meta, conformer_table, state_chunks, energies, counts)
+
+
+# HDF5 ...........................................................................
+def write_hdf5(ms: base.MS, file_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """Save the microstates and conformers of `ms` in a HDF5 file:
+    - file attribute "metadata": json string;
+    - datasets "states", "E", "count";
+    - group "conformers": one dataset per column.
+    """
+
+    h5py = _import_optional("h5py")
+
+    energies, counts = ms.get_ms_arrays()
+    n_ms, n_res = len(ms.microstates), len(ms.free_residues)
+
+    with h5py.File(file_path, "w") as fh:
+        fh.attrs["metadata"] = json.dumps(_get_metadata(ms))
+        grp = fh.create_group("conformers")
+        for name, arr in _get_conformer_table(ms).items():
+            if arr.dtype.kind == "U":
+                arr = arr.astype("S")
+            grp.create_dataset(name, data=arr)
+        fh.create_dataset("E", data=energies)
+        fh.create_dataset("count", data=counts)
+
+        if n_ms and n_res:
+            chunking = {
+                "chunks": (min(chunk_size, n_ms), n_res),
+                "compression": "gzip",
+            }
+        else:
+            # empty dataset: h5py rejects chunks larger than the data
+            chunking = {}
+        dset = fh.create_dataset(
+            "states", shape=(n_ms, n_res), dtype=np.int32, **chunking
+        )
+        start = 0
+        for states in _iter_state_chunks(ms, chunk_size):
+            dset[start : start + len(states)] = states
+            start += len(states)
+
+    return
+
+
+def read_hdf5(file_path: str, chunk_size: int = CHUNK_SIZE) -> base.MS:
+    """Return a base.MS instance from a file created by `write_hdf5`."""
+
+    h5py = _import_optional("h5py")
+
+    with h5py.File(file_path, "r") as fh:
+        meta = json.loads(fh.attrs["metadata"])
+        conformer_table = {}
+        for name, dset in fh["conformers"].items():
+            arr = dset[()]
+            if arr.dtype.kind == "S":
+                arr = arr.astype(str)
+            conformer_table[name] = arr
+        energies = fh["E"][()]
+        counts = fh["count"][()]
+        dset = fh["states"]
+        state_chunks = (
+            dset[start : start + chunk_size]
+            for start in range(0, dset.shape[0], chunk_size)
+        )
+        ms = _build_ms(meta, conformer_table, state_chunks, energies, counts)
+
+    return ms
+
+
+# Parquet & Arrow ................................................................
+def _conformers_path(file_path: Path) -> Path:
+    return file_path.with_name(f"{file_path.stem}_conformers{file_path.suffix}")
+
+
+def _write_arrow_tables(ms: base.MS, file_path: str, chunk_size: int, fmt: str):
+    """Write the microstates table of `ms` in `file_path` one record batch per chunk,
+    and its conformer table in a sibling file.
+    Columns: "E", "count", "mc", "pH", "Eh", then one column per free residue
+    holding the index of its conformer.
+    """
+
+    pa = _import_optional("pyarrow")
+    if fmt == "parquet":
+        pq = _import_optional("pyarrow.parquet")
+
+        def new_writer(path, schema):
+            return pq.ParquetWriter(path, schema)
+
+    else:
+
+        def new_writer(path, schema):
+            return pa.ipc.new_file(path, schema)
+
+    file_path = Path(file_path)
+    energies, counts = ms.get_ms_arrays()
+    res_columns = list(ms.free_residue_names)
+    if len(set(res_columns)) != len(res_columns):
+        res_columns = [f"res{i}" for i in range(len(ms.free_residues))]
+
+    meta = _get_metadata(ms)
+    meta["state_columns"] = res_columns
+    fields = [
+        pa.field("E", pa.float64()),
+        pa.field("count", pa.int64()),
+        pa.field("mc", pa.int16()),
+        pa.field("pH", pa.float64()),
+        pa.field("Eh", pa.float64()),
+    ] + [pa.field(name, pa.int32()) for name in res_columns]
+    schema = pa.schema(fields, metadata={"mccesk": json.dumps(meta)})
+
+    with new_writer(str(file_path), schema) as writer:
+        start = 0
+        for states in _iter_state_chunks(ms, chunk_size):
+            n = len(states)
+            columns = [
+                pa.array(energies[start : start + n]),
+                pa.array(counts[start : start + n]),
+                pa.array(np.full(n, ms.selected_MC, dtype=np.int16)),
+                pa.array(np.full(n, ms.pH, dtype=float)),
+                pa.array(np.full(n, ms.Eh, dtype=float)),
+            ] + [pa.array(states[:, i]) for i in range(states.shape[1])]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            start += n
+
+    conf_table = pa.table(_get_conformer_table(ms))
+    with new_writer(str(_conformers_path(file_path)), conf_table.schema) as writer:
+        writer.write_table(conf_table)
+
+    return
+
+
+def _read_arrow_tables(ms_table, conf_table) -> base.MS:
+    meta = json.loads(ms_table.schema.metadata[b"mccesk"])
+    conformer_table = {
+        name: conf_table.column(name).to_numpy(zero_copy_only=False)
+        for name in conf_table.column_names
+    }
+    energies = ms_table.column("E").to_numpy()
+    counts = ms_table.column("count").to_numpy()
+    state_table = ms_table.select(meta["state_columns"])
+    state_chunks = (
+        np.column_stack(
+            [batch.column(i).to_numpy() for i in range(batch.num_columns)]
+        ).astype(np.int32, copy=False)
+        if batch.num_columns
+        else np.empty((batch.num_rows, 0), dtype=np.int32)
+        for batch in state_table.to_batches()
+    )
+
+    return _build_ms(meta, conformer_table, state_chunks, energies, counts)
+
+
+def write_parquet(ms: base.MS, file_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """Save the microstates of `ms` in a Parquet file, one row group per chunk,
+    and its conformers in "<stem>_conformers.parquet".
+    """
+
+    _write_arrow_tables(ms, file_path, chunk_size, "parquet")
+
+    return
+
+
+def read_parquet(file_path: str) -> base.MS:
+    """Return a base.MS instance from files created by `write_parquet`."""
+
+    pq = _import_optional("pyarrow.parquet")
+    ms_table = pq.read_table(file_path)
+    conf_table = pq.read_table(_conformers_path(Path(file_path)))
+
+    return _read_arrow_tables(ms_table, conf_table)
+
+
+def write_arrow(ms: base.MS, file_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """Save the microstates of `ms` in an Arrow IPC (Feather v2) file, one record
+    batch per chunk, and its conformers in "<stem>_conformers<suffix>".
+    """
+
+    _write_arrow_tables(ms, file_path, chunk_size, "arrow")
+
+    return
+
+
+def read_arrow(file_path: str) -> base.MS:
+    """Return a base.MS instance from files created by `write_arrow`."""
+
+    pa = _import_optional("pyarrow")
+    with pa.memory_map(str(file_path)) as src:
+        ms_table = pa.ipc.open_file(src).read_all()
+    with pa.memory_map(str(_conformers_path(Path(file_path)))) as src:
+        conf_table = pa.ipc.open_file(src).read_all()
+
+    return _read_arrow_tables(ms_table, conf_table)
@@ -0,0 +1,281 @@
+"""
+Module `ms_histogram`
+
+Count-weighted energy histograms (1-D) and energy landscapes (2-D: energy by
+total charge of the free residues, or by the conformer of a chosen free residue).
+A `Histogram` has fixed bin edges, so partial histograms, e.g. from several MC
+runs or pH points, are merged by adding their values.
+Histograms are filled in a single pass, either streaming over the records of a
+MCi file, or from the cached arrays of a `base.MS` or
+`ms_trajectory.MCTrajectory` instance; the microstate list is never needed
+for the streaming pass (see `base.MS(..., load_mc_data=False)`).
+
+The module contains:
+ - Histogram (class)
+ - histogram_from_mc_file
+ - histogram_from_ms
+ - histogram_from_trajectory
+ - load_histogram
+"""
+
+from typing import Union
+import numpy as np
+from . import base
+from .ms_trajectory import MCTrajectory
+
+
+CHUNK_SIZE = 100_000  # number of MC records binned at a time
+
+
+class Histogram:
+    """Count-weighted histogram of energies, optionally by a second variable `y`."""
+
+    def __init__(
+        self,
+        energy_edges: np.ndarray,
+        y_edges: np.ndarray = None,
+        y_label: str = "",
+    ):
+        """Histogram.init
+
+        Parameters:
+            energy_edges (array): Bin edges of the energy axis (kcal/mol).
+            y_edges (array): Bin edges of the second axis; None for a 1-D histogram.
+            y_label (str): Name of the second axis variable, e.g. "charge".
+        """
+
+        self.energy_edges = np.asarray(energy_edges, dtype=float)
+        self.y_edges = None if y_edges is None else np.asarray(y_edges, dtype=float)
+        self.y_label = y_label
+        shape = (len(self.energy_edges) - 1,)
+        if self.y_edges is not None:
+            shape = shape + (len(self.y_edges) - 1,)
+        self.values = np.zeros(shape)
+        self.total_counts = 0  # includes the counts outside the bins
+
+    def __repr__(self):
+        return f"{type(self).__name__}(shape={self.values.shape}, y_label='{self.y_label}', total_counts={self.total_counts})"
+
+    def __add__(self, other):
+        return self.copy().merge(other)
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def copy(self):
+        hist = Histogram(self.energy_edges, self.y_edges, self.y_label)
+        hist.values = self.values.copy()
+        hist.total_counts = self.total_counts
+
+        return hist
+
+    def fill(self, energies: np.ndarray, counts: np.ndarray, y: np.ndarray = None):
+        """Add the `counts` of the states with `energies` (and `y` values for 2-D)."""
+
+        counts = np.asarray(counts)
+        if self.y_edges is None:
+            values, _ = np.histogram(energies, bins=self.energy_edges, weights=counts)
+        else:
+            if y is None:
+                raise ValueError("Argument `y` is required to fill a 2-D histogram.")
+            values, _, _ = np.histogram2d(
+                energies, y, bins=[self.energy_edges, self.y_edges], weights=counts
+            )
+        self.values += values
+        self.total_counts += int(counts.sum())
+
+        return self
+
+    def merge(self, other):
+        """Add the values of `other`, which must have the same bin edges, in place."""
+
+        same_edges = np.array_equal(self.energy_edges, other.energy_edges) and (
+            (self.y_edges is None and other.y_edges is None)
+            or (
+                self.y_edges is not None
+                and other.y_edges is not None
+                and np.array_equal(self.y_edges, other.y_edges)
+            )
+        )
+        if not same_edges:
+            raise ValueError("Histograms with different bin edges cannot be merged.")
+
+        self.values += other.values
+        self.total_counts += other.total_counts
+
+        return self
+
+    def density(self) -> np.ndarray:
+        """Return the fraction of the total counts in each bin."""
+
+        if not self.total_counts:
+            return np.zeros_like(self.values)
+
+        return self.values / self.total_counts
+
+    def save(self, file_path: str):
+        """Save the histogram in a npz file; see `load_histogram`."""
+
+        arrays = {
+            "energy_edges": self.energy_edges,
+            "values": self.values,
+            "total_counts": np.array(self.total_counts),
+            "y_label": np.array(self.y_label),
+        }
+        if self.y_edges is not None:
+            arrays["y_edges"] = self.y_edges
+        np.savez(file_path, **arrays)
+
+        return
+
+
+def load_histogram(file_path: str) -> Histogram:
+    """Return the Histogram saved in `file_path` by `Histogram.save`."""
+
+    with np.load(file_path, allow_pickle=False) as data:
+        y_edges = data["y_edges"] if "y_edges" in data.files else None
+        hist = Histogram(data["energy_edges"], y_edges, str(data["y_label"]))
+        hist.values = data["values"]
+        hist.total_counts = int(data["total_counts"])
+
+    return hist
+
+
+def _new_histogram(
+    ms: base.MS, energy_edges, y: Union[str, int, None], y_edges
+) -> Histogram:
+    """Return an empty Histogram for `y`: None, "charge" or a free residue index;
+    the default `y_edges` for a residue are centered on its conformer indices.
+    """
+
+    if y is None:
+        return Histogram(energy_edges)
+
+    if y == "charge":
+        if y_edges is None:
+            raise ValueError("Argument `y_edges` is required for y='charge'.")
+        return Histogram(energy_edges, y_edges, "charge")
+
+    if not isinstance(y, (int, np.integer)) or not 0 <= y < len(ms.free_residues):
+        raise ValueError(
+            f"Values for `y` are None, 'charge' or a free residue index; Given: {y}"
+        )
+    if y_edges is None:
+        iconfs = ms.free_residues[y]
+        y_edges = np.arange(min(iconfs), max(iconfs) + 2) - 0.5
+
+    return Histogram(energy_edges, y_edges, ms.free_residue_names[y])
+
+
+def histogram_from_mc_file(
+    ms: base.MS,
+    energy_edges: np.ndarray,
+    y: Union[str, int] = None,
+    y_edges: np.ndarray = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Histogram:
+    """Return the histogram of the MC records of the MCi file selected in `ms`,
+    filled in a single streaming pass.
+
+    Args:
+        ms (base.MS): A microstate class instance, which can be created with
+                      `load_mc_data=False`.
+        energy_edges (array): Bin edges of the energy axis.
+        y (str or int): None: 1-D histogram; "charge": total charge of the free
+                        residues; int: index of a free residue (conformer index).
+        y_edges (array): Bin edges of the `y` axis.
+        chunk_size (int): Number of records binned at a time.
+    """
+
+    hist = _new_histogram(ms, energy_edges, y, y_edges)
+    crg_by_iconf = np.array([conf.crg for conf in ms.conformers])
+
+    energies = []
+    counts = []
+    y_values = []
+    state = []
+    charge = 0.0
+
+    MC_file = ms.msout_file_dir.joinpath(f"MC{ms.selected_MC}")
+    with open(MC_file) as fh:
+        for nl, line in enumerate(fh):
+            line = line.strip()
+
+            if nl == 0:
+                _, confs = line.split(":")
+                state = [int(c) for c in confs.split()]
+                if not state:
+                    msg = "The current ms state line cannot be empty.\n"
+                    msg = msg + f"\tProblem line in {MC_file}: {nl}"
+                    raise ValueError(msg)
+                charge = crg_by_iconf[state].sum()
+                continue
+
+            fields = line.split(",")
+            if len(fields) < 3:
+                continue
+
+            for ic in [int(c) for c in fields[2].split()]:
+                ires = ms.ires_by_iconf[ic]
+                charge += crg_by_iconf[ic] - crg_by_iconf[state[ires]]
+                state[ires] = ic
+            energies.append(float(fields[0]))
+            counts.append(int(fields[1]))
+            if y == "charge":
+                y_values.append(charge)
+            elif y is not None:
+                y_values.append(state[y])
+
+            if len(energies) == chunk_size:
+                hist.fill(energies, counts, y_values if y is not None else None)
+                energies, counts, y_values = [], [], []
+
+    if energies:
+        hist.fill(energies, counts, y_values if y is not None else None)
+
+    return hist
+
+
+def histogram_from_ms(
+    ms: base.MS,
+    energy_edges: np.ndarray,
+    y: Union[str, int] = None,
+    y_edges: np.ndarray = None,
+) -> Histogram:
+    """Return the histogram of the unique microstates of `ms`, from its cached
+    arrays; see `histogram_from_mc_file` for the arguments.
+    """
+
+    hist = _new_histogram(ms, energy_edges, y, y_edges)
+    energies, counts = ms.get_ms_arrays()
+    if y is None:
+        return hist.fill(energies, counts)
+
+    states = ms.get_state_array()
+    if y == "charge":
+        crg_by_iconf = np.array([conf.crg for conf in ms.conformers])
+        y_values = crg_by_iconf[states].sum(axis=1)
+    else:
+        y_values = states[:, y]
+
+    return hist.fill(energies, counts, y_values)
+
+
+def histogram_from_trajectory(
+    ms: base.MS,
+    traj: MCTrajectory,
+    energy_edges: np.ndarray,
+    y: Union[str, int] = None,
+    y_edges: np.ndarray = None,
+) -> Histogram:
+    """Return the histogram of the records of `traj`, built from `ms`;
+    see `histogram_from_mc_file` for the arguments.
+    """
+
+    hist = _new_histogram(ms, energy_edges, y, y_edges)
+    if y is None:
+        return hist.fill(traj.energies, traj.counts)
+    if y == "charge":
+        return hist.fill(traj.energies, traj.counts, traj.charge_series())
+
+    return hist.fill(traj.energies, traj.counts, traj.residue_series(y))
@@ -0,0 +1,232 @@
+"""
+Module `ms_resampling`
+
+Bootstrap uncertainty estimates of conformer occupancies and residue charges.
+Each replicate redraws the total number of MC counts over the unique microstates
+of a `base.MS` instance with a multinomial draw (p = count / total counts).
+Replicates are split into fixed-size tasks run over a process pool; each task
+gets its own child of `np.random.SeedSequence(seed)`, so results are
+reproducible for a given seed whatever the number of workers.
+The state and count arrays reach the workers through shared memory: a single
+copy is held whatever the number of workers.
+
+The module contains the following functions:
+ - bootstrap_occ
+ - bootstrap_titration
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from . import base
+
+
+REPLICATES_PER_TASK = 50
+
+# Per-process data set by `_init_worker`: list of (states, counts, n_conformers).
+_WORKER_DATA = []
+# Shared memory blocks mapped by a pool worker, see `_attach_shared_data`:
+_WORKER_SHM = []
+
+
+def _init_worker(data: list):
+    global _WORKER_DATA
+    _WORKER_DATA = data
+
+
+def _share_data(data: list, blocks: list) -> list:
+    """Copy the arrays of `data` into new shared memory blocks, appended to
+    `blocks`; return the (name, shape, dtype) descriptions of the arrays.
+    """
+
+    shared = []
+    for states, counts, n_conf in data:
+        descr = []
+        for arr in (states, counts):
+            shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+            descr.append((shm.name, arr.shape, arr.dtype.str))
+        shared.append((descr[0], descr[1], n_conf))
+
+    return shared
+
+
+def _attach_shared_data(shared: list):
+    """Pool initializer: map the arrays described by `_share_data`."""
+
+    global _WORKER_SHM
+    data = []
+    for states_descr, counts_descr, n_conf in shared:
+        arrays = []
+        for name, shape, dtype in (states_descr, counts_descr):
+            shm = SharedMemory(name=name)
+            _WORKER_SHM.append(shm)
+            arrays.append(np.ndarray(shape, dtype, buffer=shm.buf))
+        data.append((arrays[0], arrays[1], n_conf))
+    _init_worker(data)
+
+
+def _get_ms_data(ms: base.MS) -> tuple:
+    _, counts = ms.get_ms_arrays()
+    return ms.get_state_array(), counts, len(ms.conformers)
+
+
+def _run_task(task: tuple) -> tuple:
+    """Return (index of ms, occupancy replicates) for `task` = (index of ms,
+    seed sequence, number of replicates).
+    """
+
+    i_ms, seed_seq, n_reps = task
+    states, counts, n_conf = _WORKER_DATA[i_ms]
+    rng = np.random.default_rng(seed_seq)
+
+    total = int(counts.sum())
+    p = counts / total
+
+    occ = np.zeros((n_reps, n_conf))
+    for r in range(n_reps):
+        rep_counts = rng.multinomial(total, p).astype(float)
+        # one free residue (column) at a time: no n_ms x n_res weights array
+        for column in states.T:
+            occ[r] += np.bincount(column, weights=rep_counts, minlength=n_conf)
+    occ /= total
+
+    return i_ms, occ
+
+
+def _get_interval(values: np.ndarray, ci: float) -> tuple:
+    alpha = (1.0 - ci) / 2
+    low, high = np.quantile(values, [alpha, 1.0 - alpha], axis=0)
+
+    return low, high
+
+
+def _get_residue_charges(ms: base.MS, occ: np.ndarray) -> np.ndarray:
+    """Return the charge of each free residue given conformer occupancies
+    (last axis of `occ`).
+    """
+
+    crg = np.array([conf.crg for conf in ms.conformers])
+    res_crg = np.zeros(occ.shape[:-1] + (len(ms.free_residues),))
+    for ires, res in enumerate(ms.free_residues):
+        res_crg[..., ires] = occ[..., res] @ crg[res]
+
+    return res_crg
+
+
+def bootstrap_titration(
+    ms_list: list,
+    n_replicates: int = 1000,
+    ci: float = 0.95,
+    seed: int = None,
+    n_workers: int = None,
+) -> list:
+    """Return bootstrap estimates for each MS instance in `ms_list`,
+    e.g. the points of a titration, sharing a single process pool.
+
+    Args:
+        ms_list (list): base.MS instances.
+        n_replicates (int): Number of bootstrap replicates per MS instance.
+        ci (float): Confidence level of the intervals.
+        seed (int): Seed for reproducibility.
+        n_workers (int): Number of processes; 1: no pool; default: os.cpu_count().
+    Returns:
+        list: One dict per MS instance, see `bootstrap_occ`.
+    """
+
+    if not 0 < ci < 1:
+        raise ValueError(f"Argument `ci` must be in (0, 1); Given: {ci}")
+    if n_replicates < 1:
+        raise ValueError(f"Argument `n_replicates` must be > 0; Given: {n_replicates}")
+
+    for ms in ms_list:
+        if not ms.microstates or not ms.counts:
+            raise ValueError(
+                f"No microstates to resample in {ms!r}: load or refresh its MC records first."
+            )
+
+    data = [_get_ms_data(ms) for ms in ms_list]
+
+    n_tasks = -(-n_replicates // REPLICATES_PER_TASK)
+    sizes = [REPLICATES_PER_TASK] * (n_tasks - 1)
+    sizes.append(n_replicates - sum(sizes))
+    tasks = []
+    for i_ms in range(len(ms_list)):
+        seed_seqs = np.random.SeedSequence([seed, i_ms] if seed is not None else None)
+        for seed_seq, n_reps in zip(seed_seqs.spawn(n_tasks), sizes):
+            tasks.append((i_ms, seed_seq, n_reps))
+
+    occ_reps = [[] for _ in ms_list]
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers == 1 or len(tasks) <= 1:
+        _init_worker(data)
+        for i_ms, occ in map(_run_task, tasks):
+            occ_reps[i_ms].append(occ)
+        _init_worker([])
+    else:
+        blocks = []
+        try:
+            shared = _share_data(data, blocks)
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_attach_shared_data,
+                initargs=(shared,),
+            ) as pool:
+                for i_ms, occ in pool.map(_run_task, tasks):
+                    occ_reps[i_ms].append(occ)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    bootstraps = []
+    for ms, reps in zip(ms_list, occ_reps):
+        occ = np.vstack(reps)
+        crg = _get_residue_charges(ms, occ)
+        occ_low, occ_high = _get_interval(occ, ci)
+        crg_low, crg_high = _get_interval(crg, ci)
+        ms_occ = np.array(ms.get_running_occ())
+        bootstraps.append(
+            {
+                "n_replicates": n_replicates,
+                "ci": ci,
+                "occ": ms_occ,
+                "occ_std": occ.std(axis=0),
+                "occ_low": occ_low,
+                "occ_high": occ_high,
+                "crg": _get_residue_charges(ms, ms_occ),
+                "crg_std": crg.std(axis=0),
+                "crg_low": crg_low,
+                "crg_high": crg_high,
+            }
+        )
+
+    return bootstraps
+
+
+def bootstrap_occ(
+    ms: base.MS,
+    n_replicates: int = 1000,
+    ci: float = 0.95,
+    seed: int = None,
+    n_workers: int = None,
+) -> dict:
+    """Return count-weighted bootstrap estimates of the conformer occupancies
+    and free residue charges of `ms`.
+
+    Args:
+        ms (base.MS): A microstate class instance.
+        n_replicates (int): Number of bootstrap replicates.
+        ci (float): Confidence level of the intervals.
+        seed (int): Seed for reproducibility.
+        n_workers (int): Number of processes; 1: no pool; default: os.cpu_count().
+    Returns:
+        dict: Keys "occ", "occ_std", "occ_low", "occ_high": arrays over
+        `ms.conformers`; "crg", "crg_std", "crg_low", "crg_high": arrays over
+        `ms.free_residues`; "n_replicates", "ci".
+    """
+
+    return bootstrap_titration([ms], n_replicates, ci, seed, n_workers)[0]
@@ -12,9 +12,8 @@ The module contains the following functions:
 from pathlib import Path
 from datetime import datetime
 import numpy as np
-import base
-import mcce_io as io
-import ms_sampling as sampling
+from . import base
+from . import mcce_io as io
 
 
 def sort_microstate_list(ms_list: list, by: str = None, reverse=False):
@@ -0,0 +1,203 @@
+"""
+Module `ms_stats`
+
+Thermodynamic statistics of the microstate ensemble held in a `base.MS` instance.
+The unique microstates, weighted by their counts, are a Boltzmann sample at
+(`MS.T`, `MS.pH`); they can be reweighted to a nearby temperature and/or pH.
+All quantities are computed with arrays over the unique microstates.
+
+Units: energies in kcal/mol; entropies and heat capacity in units of k_B.
+
+The module contains the following functions:
+ - average_energy
+ - energy_variance
+ - ensemble_stats
+ - free_energy
+ - get_beta
+ - get_energies
+ - get_weights
+ - heat_capacity
+ - microstate_entropy
+ - residue_entropy
+ - titration_stats
+"""
+
+import numpy as np
+from . import base
+from . import constants as cst
+
+
+def get_beta(T: float) -> float:
+    """Return 1/kT in (kcal/mol)^-1 at temperature `T` (K)."""
+
+    return cst.KCAL2KT * cst.ROOMT / T
+
+
+def get_energies(ms: base.MS, T: float = None, pH: float = None) -> np.ndarray:
+    """Return the energies of the unique microstates, shifted to `pH` if given,
+    using the number of protons of the conformers in each state; the energy of
+    a pH unit, ln(10)kT, is taken at `T` (default: `ms.T`).
+    """
+
+    energies, _ = ms.get_ms_arrays()
+    if pH is None or pH == ms.pH:
+        return energies
+
+    T = ms.T if T is None else T
+    nh_by_iconf = np.array([conf.nh for conf in ms.conformers], dtype=float)
+    state_nh = nh_by_iconf[ms.get_state_array()].sum(axis=1)
+
+    # PH2KCAL is ln(10)kT at ROOMT:
+    return energies + cst.PH2KCAL * T / cst.ROOMT * (pH - ms.pH) * state_nh
+
+
+def get_weights(ms: base.MS, T: float = None, pH: float = None) -> np.ndarray:
+    """Return the normalized probabilities of the unique microstates at (T, pH);
+    the defaults are the simulation conditions, where the weights are the
+    normalized counts.
+    """
+
+    energies, counts = ms.get_ms_arrays()
+    if (T is None or T == ms.T) and (pH is None or pH == ms.pH):
+        return counts / counts.sum()
+
+    T = ms.T if T is None else T
+    log_w = (
+        np.log(counts)
+        + get_beta(ms.T) * energies
+        - get_beta(T) * get_energies(ms, T, pH)
+    )
+    w = np.exp(log_w - log_w.max())
+
+    return w / w.sum()
+
+
+def average_energy(ms: base.MS, T: float = None, pH: float = None) -> float:
+    """Return the ensemble average energy <E> (kcal/mol)."""
+
+    return float(np.dot(get_weights(ms, T, pH), get_energies(ms, T, pH)))
+
+
+def energy_variance(ms: base.MS, T: float = None, pH: float = None) -> float:
+    """Return the ensemble variance of the energy <E^2> - <E>^2 ((kcal/mol)^2)."""
+
+    w = get_weights(ms, T, pH)
+    E = get_energies(ms, T, pH)
+    dE = E - np.dot(w, E)
+
+    return float(np.dot(w, dE * dE))
+
+
+def heat_capacity(ms: base.MS, T: float = None, pH: float = None) -> float:
+    """Return the heat capacity analogue var(E)/(k_B T^2), in units of k_B."""
+
+    T = ms.T if T is None else T
+
+    return get_beta(T) ** 2 * energy_variance(ms, T, pH)
+
+
+def microstate_entropy(ms: base.MS, T: float = None, pH: float = None) -> float:
+    """Return the Gibbs entropy -sum(p ln p) over the sampled unique microstates,
+    in units of k_B.
+    """
+
+    w = get_weights(ms, T, pH)
+    w = w[w > 0]
+
+    return float(-np.dot(w, np.log(w)))
+
+
+def residue_entropy(ms: base.MS, T: float = None, pH: float = None) -> np.ndarray:
+    """Return the conformational entropy -sum(p ln p) of each free residue, in units
+    of k_B, from its conformer occupancies; same order as `ms.free_residue_names`.
+    """
+
+    return _residue_entropy(ms, get_weights(ms, T, pH))
+
+
+def _residue_entropy(ms: base.MS, w: np.ndarray) -> np.ndarray:
+    states = ms.get_state_array()
+    occ = np.bincount(
+        states.ravel(),
+        weights=np.repeat(w, states.shape[1]),
+        minlength=len(ms.conformers),
+    )
+
+    free_iconfs = np.array([ic for res in ms.free_residues for ic in res], dtype=int)
+    ires = np.array([ms.ires_by_iconf[ic] for ic in free_iconfs], dtype=int)
+    p = occ[free_iconfs]
+    plogp = np.zeros_like(p)
+    nonzero = p > 0
+    plogp[nonzero] = p[nonzero] * np.log(p[nonzero])
+
+    return -np.bincount(ires, weights=plogp, minlength=len(ms.free_residues))
+
+
+def free_energy(ms: base.MS, T: float = None, pH: float = None) -> float:
+    """Return the free energy estimate <E> - TS (kcal/mol) of the sampled ensemble,
+    with S the microstate entropy.
+    """
+
+    T = ms.T if T is None else T
+
+    return average_energy(ms, T, pH) - microstate_entropy(ms, T, pH) / get_beta(T)
+
+
+def ensemble_stats(ms: base.MS, T: float = None, pH: float = None) -> dict:
+    """Return all the statistics of the ensemble at (T, pH) in a dict.
+    The weights and energies are computed once.
+    """
+
+    T = ms.T if T is None else T
+    pH = ms.pH if pH is None else pH
+    beta = get_beta(T)
+
+    w = get_weights(ms, T, pH)
+    E = get_energies(ms, T, pH)
+    E_avg = float(np.dot(w, E))
+    dE = E - E_avg
+    E_var = float(np.dot(w, dE * dE))
+    nonzero = w[w > 0]
+    S = float(-np.dot(nonzero, np.log(nonzero)))
+    S_res = _residue_entropy(ms, w)
+
+    return {
+        "T": T,
+        "pH": pH,
+        "Eh": ms.Eh,
+        "average_energy": E_avg,
+        "energy_variance": E_var,
+        "heat_capacity": beta**2 * E_var,
+        "microstate_entropy": S,
+        "residue_entropy": S_res,
+        "residue_entropy_total": float(S_res.sum()),
+        "free_energy": E_avg - S / beta,
+    }
+
+
+def titration_stats(ms_list: list, T: float = None) -> dict:
+    """Return the statistics of each MS instance of a titration (e.g. one per pH point)
+    at its own pH, and at temperature `T` if given.
+
+    Returns:
+        dict: Scalar statistics as arrays over `ms_list`; "residue_entropy" is a
+        dict: residue name -> array over `ms_list` (0 where the residue is fixed).
+    """
+
+    all_stats = [ensemble_stats(ms, T) for ms in ms_list]
+
+    titration = {}
+    if all_stats:
+        for key in all_stats[0]:
+            if key != "residue_entropy":
+                titration[key] = np.array([stats[key] for stats in all_stats])
+
+    res_entropy = {}
+    for i, (ms, stats) in enumerate(zip(ms_list, all_stats)):
+        for name, S in zip(ms.free_residue_names, stats["residue_entropy"]):
+            if name not in res_entropy:
+                res_entropy[name] = np.zeros(len(ms_list))
+            res_entropy[name][i] = S
+    titration["residue_entropy"] = res_entropy
+
+    return titration
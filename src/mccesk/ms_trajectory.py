@@ -0,0 +1,316 @@
+"""
+Module `ms_trajectory`
+
+Ordered view of the MC records of a MC run, as written in the MCi file:
+each record holds the energy and count of a state, and the conformers flipped
+from the previous state.
+The `MCTrajectory` class keeps these deltas in compact arrays (CSR layout) with
+full-state checkpoints every `checkpoint_interval` records, for random access
+to the state at any record and fast iteration.
+
+Time series are indexed by record; a record's state lasts `count` MC steps,
+which the analysis functions use as weights.
+
+The module contains:
+ - MCTrajectory (class)
+ - autocorrelation
+ - dwell_times
+ - transition_matrix
+"""
+
+from array import array
+import numpy as np
+from . import base
+
+
+class MCTrajectory:
+    """Delta-encoded trajectory of the MC run selected in a base.MS instance."""
+
+    def __init__(self, ms: base.MS, checkpoint_interval: int = 1000):
+        """MCTrajectory.init
+
+        Parameters:
+            ms (base.MS): A microstate class instance; its MC{ms.selected_MC}
+                          file is read.
+            checkpoint_interval (int): Number of records between full-state checkpoints.
+        """
+
+        if checkpoint_interval < 1:
+            raise ValueError(
+                f"Argument `checkpoint_interval` must be > 0; Given: {checkpoint_interval}"
+            )
+
+        self.selected_MC = ms.selected_MC
+        self.checkpoint_interval = checkpoint_interval
+        self.crg_by_iconf = np.array([conf.crg for conf in ms.conformers])
+        # index of free residue by index of conf, -1 for fixed conformers:
+        self.ires_by_iconf = np.full(len(ms.conformers), -1, dtype=np.int32)
+        for iconf, ires in ms.ires_by_iconf.items():
+            self.ires_by_iconf[iconf] = ires
+
+        self.initial_state = np.empty(0, dtype=np.int32)
+        self.energies = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.flip_offsets = np.zeros(1, dtype=np.int64)
+        self.flip_iconfs = np.empty(0, dtype=np.int32)
+        self.checkpoints = np.empty((0, 0), dtype=np.int32)
+
+        self._read_mc_file(ms.msout_file_dir.joinpath(f"MC{ms.selected_MC}"))
+        self._set_checkpoints()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(MC{self.selected_MC}, n_records={len(self)}, checkpoint_interval={self.checkpoint_interval})"
+
+    def __len__(self):
+        return len(self.energies)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.state(i)
+
+    def __iter__(self):
+        return self.iter_states()
+
+    def _read_mc_file(self, MC_file):
+        """Populate initial_state, energies, counts and the flips arrays."""
+
+        # compact typed buffers, filled line by line:
+        energies = array("d")
+        counts = array("q")
+        n_flips = array("q")
+        flips = array("i")
+
+        with open(MC_file) as fh:
+            for nl, line in enumerate(fh):
+                line = line.strip()
+
+                if nl == 0:
+                    _, confs = line.split(":")
+                    self.initial_state = np.array(confs.split(), dtype=np.int32)
+                    if not len(self.initial_state):
+                        msg = "The current ms state line cannot be empty.\n"
+                        msg = msg + f"\tProblem line in {MC_file}: {nl}"
+                        raise ValueError(msg)
+                    continue
+
+                fields = line.split(",")
+                if len(fields) >= 3:
+                    n_before = len(flips)
+                    flips.extend(map(int, fields[2].split()))
+                    energies.append(float(fields[0]))
+                    counts.append(int(fields[1]))
+                    n_flips.append(len(flips) - n_before)
+
+        # arrays built through the buffer protocol:
+        self.energies = np.array(energies, dtype=np.float64)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.flip_offsets = np.zeros(len(n_flips) + 1, dtype=np.int64)
+        np.cumsum(np.array(n_flips, dtype=np.int64), out=self.flip_offsets[1:])
+        self.flip_iconfs = np.array(flips, dtype=np.int32)
+
+        return
+
+    def _set_checkpoints(self):
+        """Store the full state after every `checkpoint_interval`-th record."""
+
+        n_checkpoints = -(-len(self) // self.checkpoint_interval)
+        self.checkpoints = np.empty(
+            (n_checkpoints, len(self.initial_state)), dtype=np.int32
+        )
+        state = self.initial_state.copy()
+        for k in range(n_checkpoints):
+            i = k * self.checkpoint_interval
+            self._apply_flips(state, i - self.checkpoint_interval if k else -1, i)
+            self.checkpoints[k] = state
+
+        return
+
+    def _apply_flips(self, state: np.ndarray, i: int, j: int) -> np.ndarray:
+        """Apply to `state`, in place, the flips of records i+1 to j included."""
+
+        iconfs = self.flip_iconfs[self.flip_offsets[i + 1] : self.flip_offsets[j + 1]]
+        if len(iconfs):
+            # keep the last flip of each residue:
+            ires = self.ires_by_iconf[iconfs[::-1]]
+            ires, last = np.unique(ires, return_index=True)
+            state[ires] = iconfs[::-1][last]
+
+        return state
+
+    def state(self, i: int) -> np.ndarray:
+        """Return the state (conformer index of each free residue) at record `i`."""
+
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"Record index out of range: {i}")
+
+        k = i // self.checkpoint_interval
+        state = self.checkpoints[k].copy()
+
+        return self._apply_flips(state, k * self.checkpoint_interval, i)
+
+    def iter_states(self, start: int = 0, stop: int = None):
+        """Yield (energy, count, state) for records `start` to `stop` (excluded).
+        The yielded state array is updated in place: copy it to keep it.
+        """
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        state = self.state(start)
+        yield self.energies[start], self.counts[start], state
+        for i in range(start + 1, stop):
+            for iconf in self.flip_iconfs[
+                self.flip_offsets[i] : self.flip_offsets[i + 1]
+            ]:
+                state[self.ires_by_iconf[iconf]] = iconf
+            yield self.energies[i], self.counts[i], state
+
+    def residue_series(self, ires: int) -> np.ndarray:
+        """Return the conformer index of free residue `ires` at every record."""
+
+        record_of_flip = np.repeat(
+            np.arange(len(self), dtype=np.int64), np.diff(self.flip_offsets)
+        )
+        mask = self.ires_by_iconf[self.flip_iconfs] == ires
+
+        # index of the last flip of the residue up to each record, -1 if none:
+        last_flip = np.full(len(self), -1, dtype=np.int64)
+        np.maximum.at(last_flip, record_of_flip[mask], np.flatnonzero(mask))
+        np.maximum.accumulate(last_flip, out=last_flip)
+
+        series = np.full(len(self), self.initial_state[ires], dtype=np.int32)
+        flipped = last_flip >= 0
+        series[flipped] = self.flip_iconfs[last_flip[flipped]]
+
+        return series
+
+    def charge_series(self) -> np.ndarray:
+        """Return the total charge of the free residues at every record."""
+
+        charges = np.zeros(len(self))
+        for ires in range(len(self.initial_state)):
+            charges += self.crg_by_iconf[self.residue_series(ires)]
+
+        return charges
+
+
+def transition_matrix(
+    series: np.ndarray, counts: np.ndarray = None, normalize: bool = True
+) -> tuple:
+    """Return the labels and transition matrix of a discrete per-record series,
+    e.g. `MCTrajectory.residue_series` (conformers) or rounded charges.
+    With `counts`, a record lasting `count` MC steps also adds count - 1
+    self-transitions, i.e. the lag is one MC step.
+
+    Returns:
+        tuple: labels (sorted unique values of `series`), matrix with
+        matrix[a, b] for transitions from labels[a] to labels[b]; rows sum to 1
+        if `normalize`.
+    """
+
+    labels, idx = np.unique(series, return_inverse=True)
+    n = len(labels)
+    matrix = np.bincount(idx[:-1] * n + idx[1:], minlength=n * n).astype(float)
+    matrix = matrix.reshape(n, n)
+    if counts is not None:
+        matrix[np.diag_indices(n)] += np.bincount(idx, weights=counts - 1, minlength=n)
+
+    if normalize:
+        totals = matrix.sum(axis=1, keepdims=True)
+        matrix = np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+
+    return labels, matrix
+
+
+def _autocovariance_runs(y: np.ndarray, counts: np.ndarray, max_lag: int) -> np.ndarray:
+    """Return R(L) = sum_t y(t) y(t + L) for L in 0..max_lag, where y(t) is the
+    step function holding y[i] for counts[i] MC steps, without expanding the steps.
+
+    The jumps D of y (at each record start, and -y[-1] at the end) are sparse and
+    R_D(L) = 2R(L) - R(L - 1) - R(L + 1); R_D is summed over the pairs of jumps
+    less than `max_lag` steps apart, then R follows from R(0) and R(1).
+    """
+
+    keep = counts > 0
+    y, counts = y[keep], counts[keep]
+    positions = np.concatenate(([0], np.cumsum(counts)))
+    jumps = np.diff(y, prepend=0.0, append=0.0)
+
+    # R_D(L) for L in 1..max_lag - 1; pairs (i, i + k) are taken for increasing
+    # k while they are close enough, so the work is the number of such pairs:
+    R_D = np.zeros(max_lag)
+    idx = np.arange(len(positions))
+    k = 1
+    while True:
+        idx = idx[idx + k < len(positions)]
+        lags = positions[idx + k] - positions[idx]
+        close = lags < max_lag
+        idx, lags = idx[close], lags[close]
+        if not len(idx):
+            break
+        R_D += np.bincount(lags, weights=jumps[idx] * jumps[idx + k], minlength=max_lag)
+        k += 1
+
+    R = np.empty(max_lag + 1)
+    R[0] = np.dot(y * y, counts)
+    if max_lag:
+        R[1] = np.dot(y * y, counts - 1) + np.dot(y[:-1], y[1:])
+        # R(L + 1) - R(L) = R(1) - R(0) - sum_{l=1..L} R_D(l):
+        steps = (R[1] - R[0]) - np.cumsum(R_D[1:])
+        R[2:] = R[1] + np.cumsum(steps)
+
+    return R
+
+
+def autocorrelation(
+    series: np.ndarray, counts: np.ndarray = None, max_lag: int = None
+) -> np.ndarray:
+    """Return the normalized autocorrelation function of `series` for lags
+    0 to `max_lag`.
+    Without `counts`, lags are in records and the function is computed by FFT;
+    `max_lag` defaults to len(series) - 1.
+    With `counts`, a record's value lasts `count` MC steps and lags are in MC
+    steps; the function is computed over the pairs of records less than
+    `max_lag` steps apart, so `max_lag` is required.
+    """
+
+    x = np.asarray(series, dtype=float)
+
+    if counts is not None:
+        if max_lag is None:
+            raise ValueError("Argument `max_lag` (MC steps) is required with `counts`.")
+        counts = np.asarray(counts, dtype=np.int64)
+        n_steps = int(counts.sum())
+        max_lag = min(max_lag, n_steps - 1)
+        y = x - np.dot(x, counts) / n_steps
+        acf = _autocovariance_runs(y, counts, max_lag)
+    else:
+        n = len(x)
+        max_lag = n - 1 if max_lag is None else min(max_lag, n - 1)
+        y = x - x.mean()
+        size = 1 << (2 * n - 1).bit_length()
+        f = np.fft.rfft(y, size)
+        acf = np.fft.irfft(f * np.conjugate(f), size)[: max_lag + 1]
+
+    if acf[0] == 0:
+        return np.ones(max_lag + 1)
+
+    return acf / acf[0]
+
+
+def dwell_times(series: np.ndarray, counts: np.ndarray = None) -> tuple:
+    """Return the values and durations of the runs of equal consecutive values
+    in `series`; durations are in MC steps with `counts`, otherwise in records.
+    """
+
+    series = np.asarray(series)
+    if not len(series):
+        return np.empty(0, dtype=series.dtype), np.empty(0, dtype=np.int64)
+
+    starts = np.concatenate(([0], np.flatnonzero(series[1:] != series[:-1]) + 1))
+    if counts is None:
+        counts = np.ones(len(series), dtype=np.int64)
+
+    return series[starts], np.add.reduceat(counts, starts)
@@ -0,0 +1,106 @@
+"""Shared fixtures: a synthetic MCCE output folder built from tests/data.
+
+The msout file holds `constants.MONTE_RUNS` MC blocks of `n_records` records over
+the free residues listed in tests/data/ms_out/pH5eH0ms/header. A state's energy
+is the sum of random per-conformer energies, so a state always has the same
+energy, as in MCCE. Conformer charges are set to their number of protons.
+"""
+
+import random
+import re
+import shutil
+from pathlib import Path
+import pytest
+from mccesk import base
+from mccesk import constants as cst
+
+
+DATA_DIR = Path(__file__).parent.joinpath("data")
+N_RECORDS = 400
+
+
+def write_head3(head3_path: Path):
+    """Copy tests/data/head3.lst with crg = nH for each conformer."""
+
+    lines = DATA_DIR.joinpath("head3.lst").read_text().splitlines()
+    with open(head3_path, "w") as fh:
+        fh.write(lines[0] + "\n")
+        for line in lines[1:]:
+            fields = line.split()
+            if len(line) > 80:
+                crg = f"{float(fields[8]):.3f}"
+                line = re.sub(r"^((?:\S+\s+){4})\S+", r"\g<1>" + crg, line)
+            fh.write(line + "\n")
+
+
+def get_msout_lines(n_records: int = N_RECORDS, seed: int = 0) -> list:
+    """Return the lines of a synthetic msout file."""
+
+    rng = random.Random(seed)
+    header = DATA_DIR.joinpath("ms_out", "pH5eH0ms", "header").read_text().splitlines()
+    free = [
+        [int(n) for n in grp.split()]
+        for grp in header[3].split(":")[1].strip(" ;").split(";")
+    ]
+    conf_energy = {ic: rng.uniform(-2, 2) for res in free for ic in res}
+
+    lines = ["# synthetic msout file"] + header[:4]
+    for k in range(cst.MONTE_RUNS):
+        lines.append(f"MC:{k}")
+        state = [rng.choice(res) for res in free]
+        lines.append(f"{len(state)}:" + " ".join(map(str, state)))
+        for _ in range(n_records):
+            flipped = []
+            for ires in rng.sample(range(len(free)), rng.randint(1, 2)):
+                ic = rng.choice(free[ires])
+                state[ires] = ic
+                flipped.append(ic)
+            E = -100 + sum(conf_energy[ic] for ic in state)
+            count = rng.randint(1, 30)
+            lines.append(f"{E:.3f}, {count}, " + " ".join(map(str, flipped)))
+        if k == 2:
+            lines.append("")  # blank line, skipped by the parsers
+
+    return lines
+
+
+def make_mcce_run(root: Path, n_records: int = N_RECORDS, seed: int = 0) -> Path:
+    """Create a MCCE output folder in `root`; return the msout file path."""
+
+    root.joinpath("ms_out").mkdir(parents=True)
+    write_head3(root.joinpath("head3.lst"))
+    shutil.copy(DATA_DIR.joinpath("step2_out.pdb"), root)
+    msout = root.joinpath("ms_out", "pH5eH0ms.txt")
+    msout.write_text("\n".join(get_msout_lines(n_records, seed)) + "\n")
+
+    return msout
+
+
+@pytest.fixture
+def make_run():
+    """Return the `make_mcce_run` factory, for tests needing several folders
+    or other `n_records`: make_run(root, n_records) -> msout file path.
+    """
+
+    return make_mcce_run
+
+
+@pytest.fixture
+def mcce_run(tmp_path) -> Path:
+    """Return the path of a synthetic MCCE output folder."""
+
+    make_mcce_run(tmp_path)
+
+    return tmp_path
+
+
+@pytest.fixture
+def ms(request, mcce_run) -> base.MS:
+    """Return the MS of the synthetic run at pH 5, Eh 0 for MC run 0, or for the
+    MC run given by indirect parametrization:
+    @pytest.mark.parametrize("ms", [2], indirect=True)
+    """
+
+    selected_MC = getattr(request, "param", 0)
+
+    return base.MS(mcce_run, 5.0, 0.0, selected_MC=selected_MC)
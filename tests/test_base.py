@@ -0,0 +1,70 @@
+import warnings
+import numpy as np
+import pytest
+from mccesk import base
+
+
+def ms_data(ms: base.MS) -> list:
+    return [(m.stateid, m.E, m.count) for m in ms.microstates]
+
+
+@pytest.mark.parametrize("selected_MC", [0, 2, 5])
+@pytest.mark.parametrize("cut", [0.1, 0.37, 0.5, 0.83, 0.999])
+def test_refresh_matches_full_load(tmp_path, make_run, selected_MC, cut):
+    ref_run = tmp_path.joinpath("ref")
+    make_run(ref_run)
+    ref = base.MS(ref_run, 5.0, 0.0, selected_MC=selected_MC)
+
+    run = tmp_path.joinpath("live")
+    msout = make_run(run)
+    full = msout.read_bytes()
+    # truncated mid-line while the run is in progress:
+    cut_at = int(len(full) * cut)
+    assert full[cut_at - 1 : cut_at] != b"\n"
+    msout.write_bytes(full[:cut_at])
+    ms = base.MS(run, 5.0, 0.0, selected_MC=selected_MC)
+
+    n_records = ms._n_records
+    for step in np.linspace(cut_at, len(full), 4)[1:].astype(int):
+        msout.write_bytes(full[:step])
+        n_records += ms.refresh()
+        assert ms._n_records == n_records
+
+    assert ms.refresh() == 0
+    assert ms.counts == ref.counts
+    assert ms_data(ms) == ms_data(ref)
+    assert np.allclose(ms.get_running_occ(), ref.get_running_occ())
+    assert np.allclose(ms.get_running_occ(), ref.get_occ(ref.microstates))
+
+
+@pytest.mark.parametrize("ms", [1], indirect=True)
+def test_refresh_after_header_only_load(mcce_run, ms):
+    header_ms = base.MS(mcce_run, 5.0, 0.0, selected_MC=1, load_mc_data=False)
+    assert header_ms.microstates == []
+    assert header_ms.refresh() == ms._n_records
+    assert ms_data(header_ms) == ms_data(ms)
+
+
+def test_running_occ_before_any_record(mcce_run):
+    ms = base.MS(mcce_run, 5.0, 0.0, load_mc_data=False)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        occ = ms.get_running_occ()
+    assert occ == [0.0] * len(ms.conformers)
+
+
+def test_split_of_in_progress_run_is_complete(tmp_path, make_run):
+    # blocks larger than the write buffers of the split files:
+    msout = make_run(tmp_path, n_records=3000)
+    full = msout.read_text()
+    in_progress = full[: full.index("MC:3")]
+    in_progress = in_progress[: in_progress.rindex("\n") - 10]
+    msout.write_text(in_progress)
+
+    lines = in_progress[: in_progress.rindex("\n")].splitlines()
+    n_records = len([ln for ln in lines[lines.index("MC:2") :] if ln.count(",") == 2])
+    ms = base.MS(tmp_path, 5.0, 0.0, selected_MC=2)
+
+    assert ms._n_records == n_records
+    MC_lines = ms.msout_file_dir.joinpath("MC2").read_text().splitlines()
+    assert len(MC_lines) == n_records + 1
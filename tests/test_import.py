@@ -0,0 +1,53 @@
+"""Import-time budget of the `mccesk` package: a bare import must stay cheap
+(no numpy) for short CLI calls and pool workers.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+SRC_DIR = Path(__file__).parents[1].joinpath("src")
+IMPORT_TIME_BUDGET_US = 50_000  # cumulative `import mccesk` time, microseconds
+
+
+def run_import(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(SRC_DIR)] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+
+def get_cumulative_us(importtime_log: str, module: str) -> int:
+    """Return the cumulative import time of `module` from a `-X importtime` log."""
+
+    for line in importtime_log.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    raise ValueError(f"Module {module} not found in importtime log.")
+
+
+def test_import_does_not_load_numpy():
+    proc = run_import("import sys, mccesk; print('numpy' in sys.modules)")
+    assert proc.stdout.strip() == "False"
+
+
+def test_import_time_budget():
+    proc = run_import("import mccesk")
+    assert get_cumulative_us(proc.stderr, "mccesk") < IMPORT_TIME_BUDGET_US
+
+
+def test_lazy_attributes():
+    proc = run_import(
+        "import sys, mccesk; mccesk.MS; print('mccesk.base' in sys.modules)"
+    )
+    assert proc.stdout.strip() == "True"
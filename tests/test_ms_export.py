@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from mccesk import base
+from mccesk import ms_export as export
+
+
+FORMATS = {
+    "npz": (export.write_npz, export.read_npz, None),
+    "hdf5": (export.write_hdf5, export.read_hdf5, "h5py"),
+    "parquet": (export.write_parquet, export.read_parquet, "pyarrow"),
+    "arrow": (export.write_arrow, export.read_arrow, "pyarrow"),
+}
+
+
+def assert_same_ms(a: base.MS, b: base.MS):
+    for attr in [
+        "T",
+        "pH",
+        "Eh",
+        "method",
+        "selected_MC",
+        "counts",
+        "iconf_by_confname",
+        "fixed_iconfs",
+        "fixed_residue_names",
+        "free_residues",
+        "free_residue_names",
+        "ires_by_iconf",
+        "fname",
+        "msout_file_dir",
+    ]:
+        assert getattr(a, attr) == getattr(b, attr), attr
+    assert [c.__dict__ for c in a.conformers] == [c.__dict__ for c in b.conformers]
+    assert [(m.stateid, m.E, m.count) for m in a.microstates] == [
+        (m.stateid, m.E, m.count) for m in b.microstates
+    ]
+    assert np.allclose(a.get_running_occ(), b.get_running_occ())
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("load_mc_data", [True, False])
+def test_round_trip(mcce_run, tmp_path, fmt, load_mc_data):
+    write, read, dependency = FORMATS[fmt]
+    if dependency is not None:
+        pytest.importorskip(dependency)
+
+    ms = base.MS(mcce_run, 5.0, 0.0, selected_MC=3, load_mc_data=load_mc_data)
+    file_path = tmp_path.joinpath(f"ms.{fmt}")
+    write(ms, file_path, chunk_size=50)
+    ms_read = read(file_path)
+    assert_same_ms(ms, ms_read)
+
+    # the rebuilt instance can still be refreshed from the msout file:
+    assert ms_read.refresh() == ms.refresh()
+    assert_same_ms(ms, ms_read)
+    if not load_mc_data:
+        assert ms_read.microstates
+
+
+def test_read_ms_supports_queries(ms, tmp_path):
+    export.write_npz(ms, tmp_path.joinpath("ms.npz"))
+    ms_read = export.read_npz(tmp_path.joinpath("ms.npz"))
+    assert ms_read.top_k("energy", 3) == ms_read.get_sorted_microstates("energy")[:3]
+    assert [m.E for m in ms_read.top_k("energy", 3)] == [
+        m.E for m in ms.top_k("energy", 3)
+    ]
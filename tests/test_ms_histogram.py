@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from mccesk import base
+from mccesk import ms_histogram as mh
+from mccesk.ms_trajectory import MCTrajectory
+
+
+ENERGY_EDGES = np.linspace(-130, -70, 61)
+CHARGE_EDGES = np.arange(-30, 32) - 0.5
+
+
+# `ms` fixture (conftest.py) for MC run 4:
+pytestmark = pytest.mark.parametrize("ms", [4], indirect=True)
+
+
+@pytest.mark.parametrize(
+    "y, y_edges", [(None, None), ("charge", CHARGE_EDGES), (5, None)]
+)
+@pytest.mark.parametrize("chunk_size", [1, 17, 10**6])
+def test_streaming_matches_trajectory_and_ms(mcce_run, ms, y, y_edges, chunk_size):
+    # the streaming pass needs no microstates:
+    header_ms = base.MS(
+        mcce_run, 5.0, 0.0, selected_MC=ms.selected_MC, load_mc_data=False
+    )
+    streamed = mh.histogram_from_mc_file(
+        header_ms, ENERGY_EDGES, y, y_edges, chunk_size=chunk_size
+    )
+    from_traj = mh.histogram_from_trajectory(
+        ms, MCTrajectory(ms), ENERGY_EDGES, y, y_edges
+    )
+    from_ms = mh.histogram_from_ms(ms, ENERGY_EDGES, y, y_edges)
+
+    assert streamed.values.shape == from_traj.values.shape
+    assert np.array_equal(streamed.values, from_traj.values)
+    # a state always has the same energy: unique states give the same histogram
+    assert np.allclose(streamed.values, from_ms.values)
+    assert streamed.total_counts == from_traj.total_counts == ms.counts
+    assert np.isclose(streamed.values.sum(), ms.counts)
+
+
+def test_merge_and_add(mcce_run, ms):
+    other = base.MS(mcce_run, 5.0, 0.0, selected_MC=1)
+    a = mh.histogram_from_ms(ms, ENERGY_EDGES, "charge", CHARGE_EDGES)
+    b = mh.histogram_from_ms(other, ENERGY_EDGES, "charge", CHARGE_EDGES)
+
+    total = a + b
+    assert np.array_equal(total.values, a.values + b.values)
+    assert total.total_counts == ms.counts + other.counts
+    # `+` leaves its operands unchanged; merge is in place:
+    assert a.total_counts == ms.counts
+    a.merge(b)
+    assert np.array_equal(a.values, total.values)
+    assert np.isclose(total.density().sum(), 1)
+
+    with pytest.raises(ValueError):
+        total.merge(mh.histogram_from_ms(ms, ENERGY_EDGES))
+
+
+@pytest.mark.parametrize("y, y_edges", [(None, None), ("charge", CHARGE_EDGES)])
+def test_save_load_round_trip(ms, tmp_path, y, y_edges):
+    hist = mh.histogram_from_ms(ms, ENERGY_EDGES, y, y_edges)
+    hist.save(tmp_path.joinpath("hist.npz"))
+    loaded = mh.load_histogram(tmp_path.joinpath("hist.npz"))
+
+    assert np.array_equal(loaded.values, hist.values)
+    assert np.array_equal(loaded.energy_edges, hist.energy_edges)
+    assert loaded.total_counts == hist.total_counts
+    assert loaded.y_label == hist.y_label
+    if y_edges is None:
+        assert loaded.y_edges is None
+    else:
+        assert np.array_equal(loaded.y_edges, hist.y_edges)
+    # a loaded histogram merges with a new one:
+    assert (loaded + hist).total_counts == 2 * hist.total_counts
+
+
+def test_invalid_y(ms):
+    with pytest.raises(ValueError):
+        mh.histogram_from_ms(ms, ENERGY_EDGES, "charge")
+    with pytest.raises(ValueError):
+        mh.histogram_from_ms(ms, ENERGY_EDGES, len(ms.free_residues))
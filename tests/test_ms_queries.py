@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from mccesk import ms_sampling as sampling
+
+
+# `ms` fixture (conftest.py) for MC run 1:
+pytestmark = pytest.mark.parametrize("ms", [1], indirect=True)
+
+
+def ids(microstates: list) -> list:
+    return [id(m) for m in microstates]
+
+
+def sorted_ids(ms_list: list, by: str) -> list:
+    """Ids of the microstates sorted by `sampling.sort_microstate_list`:
+    ascending energy or descending count, ties in list order.
+    """
+
+    sorted_list = sampling.sort_microstate_list(ms_list, by=by, reverse=by == "count")
+    return [id(x[2].__self__) for x in sorted_list]
+
+
+@pytest.mark.parametrize("by", ["energy", "count"])
+@pytest.mark.parametrize("k", [1, 5, 37, 10**6])
+def test_top_k_matches_sort_microstate_list(ms, by, k):
+    expected = sorted_ids(ms.microstates, by)[:k]
+    assert ids(ms.top_k(by, k)) == expected
+    # same result once the sort index is cached:
+    assert ids(ms.get_sorted_microstates(by))[:k] == expected
+    assert ids(ms.top_k(by, k)) == expected
+
+
+def test_top_k_ties_do_not_depend_on_cache(ms):
+    for m in ms.microstates:
+        m.E = round(m.E)
+    ms._reset_ms_index()
+
+    before = ids(ms.top_k("energy", 4))
+    ms.select_by_energy_window(-200, 0)
+    assert ids(ms.top_k("energy", 4)) == before
+    assert before == sorted_ids(ms.microstates, "energy")[:4]
+
+
+def test_top_k_edge_cases(ms):
+    assert ms.top_k("energy", 0) == []
+    with pytest.raises(ValueError):
+        ms.top_k("charge", 3)
+
+
+@pytest.mark.parametrize("window", [[-101, -99], [-99, -101], [-1000, 0], [0, 1]])
+def test_energy_window_matches_select_by_energy(ms, window):
+    selected, _ = ms.select_by_energy(ms.microstates, list(window))
+    window_ms = ms.select_by_energy_window(*window)
+    assert sorted(ids(window_ms)) == sorted(ids(selected))
+    energies = [m.E for m in window_ms]
+    assert energies == sorted(energies)
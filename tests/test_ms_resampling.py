@@ -0,0 +1,58 @@
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pytest
+from mccesk import base
+from mccesk import ms_resampling as resampling
+
+
+def test_same_seed_same_results_any_n_workers(ms):
+    serial = resampling.bootstrap_occ(ms, 120, seed=11, n_workers=1)
+    parallel = resampling.bootstrap_occ(ms, 120, seed=11, n_workers=3)
+    for key, value in serial.items():
+        assert np.array_equal(value, parallel[key]), key
+
+    other_seed = resampling.bootstrap_occ(ms, 120, seed=12, n_workers=1)
+    assert not np.array_equal(serial["occ_std"], other_seed["occ_std"])
+
+
+def test_intervals(ms):
+    result = resampling.bootstrap_occ(ms, 100, ci=0.9, seed=0, n_workers=1)
+    assert np.allclose(result["occ"], ms.get_occ(ms.microstates))
+    assert np.all(result["occ_low"] <= result["occ_high"])
+    assert np.all(result["crg_low"] <= result["crg_high"])
+    assert result["crg"].shape == (len(ms.free_residues),)
+
+
+def test_titration_shares_seeding(ms):
+    both = resampling.bootstrap_titration([ms, ms], 60, seed=3, n_workers=2)
+    single = resampling.bootstrap_occ(ms, 60, seed=3, n_workers=1)
+    assert np.array_equal(both[0]["occ_std"], single["occ_std"])
+
+
+def test_no_microstates(mcce_run):
+    ms = base.MS(mcce_run, 5.0, 0.0, load_mc_data=False)
+    with pytest.raises(ValueError, match="No microstates to resample"):
+        resampling.bootstrap_occ(ms, 10, n_workers=1)
+
+
+@pytest.mark.parametrize("kwargs", [{"ci": 1.5}, {"n_replicates": 0}])
+def test_invalid_arguments(ms, kwargs):
+    with pytest.raises(ValueError):
+        resampling.bootstrap_occ(ms, **{"n_replicates": 10, **kwargs})
+
+
+def test_shared_memory_is_released(ms, monkeypatch):
+    names = []
+    share_data = resampling._share_data
+
+    def spy(data, blocks):
+        shared = share_data(data, blocks)
+        names.extend(shm.name for shm in blocks)
+        return shared
+
+    monkeypatch.setattr(resampling, "_share_data", spy)
+    resampling.bootstrap_titration([ms, ms], 120, seed=0, n_workers=2)
+    assert len(names) == 4
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
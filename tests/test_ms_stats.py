@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from mccesk import base
+from mccesk import constants as cst
+from mccesk import ms_stats as stats
+
+
+def direct_stats(ms: base.MS, T: float, pH: float) -> dict:
+    """Statistics from Python sums over the microstates."""
+
+    beta0 = cst.KCAL2KT * cst.ROOMT / ms.T
+    beta = cst.KCAL2KT * cst.ROOMT / T
+    energies, weights = [], []
+    for m in ms.microstates:
+        nh = sum(ms.conformers[ic].nh for ic in m.state())
+        E = m.E + cst.PH2KCAL * T / cst.ROOMT * (pH - ms.pH) * nh
+        energies.append(E)
+        weights.append(m.count * np.exp(beta0 * m.E - beta * E))
+    w = np.array(weights) / sum(weights)
+    E = np.array(energies)
+
+    E_avg = float(np.sum(w * E))
+    E_var = float(np.sum(w * (E - E_avg) ** 2))
+    S = float(-np.sum(w * np.log(w)))
+    occ = np.zeros(len(ms.conformers))
+    for m, wi in zip(ms.microstates, w):
+        occ[m.state()] += wi
+    S_res = [
+        -sum(occ[ic] * np.log(occ[ic]) for ic in res if occ[ic] > 0)
+        for res in ms.free_residues
+    ]
+
+    return {
+        "average_energy": E_avg,
+        "energy_variance": E_var,
+        "heat_capacity": beta**2 * E_var,
+        "microstate_entropy": S,
+        "residue_entropy": np.array(S_res),
+        "free_energy": E_avg - S / beta,
+    }
+
+
+@pytest.mark.parametrize(
+    "T, pH", [(None, None), (310.0, None), (None, 5.5), (290.0, 4.5)]
+)
+def test_ensemble_stats_match_direct_sums(ms, T, pH):
+    result = stats.ensemble_stats(ms, T, pH)
+    expected = direct_stats(ms, ms.T if T is None else T, ms.pH if pH is None else pH)
+    for key, value in expected.items():
+        assert np.allclose(result[key], value), key
+    assert np.isclose(
+        result["residue_entropy_total"], expected["residue_entropy"].sum()
+    )
+    # single-quantity functions agree with ensemble_stats:
+    assert np.isclose(stats.average_energy(ms, T, pH), result["average_energy"])
+    assert np.isclose(stats.heat_capacity(ms, T, pH), result["heat_capacity"])
+    assert np.isclose(stats.free_energy(ms, T, pH), result["free_energy"])
+    assert np.allclose(stats.residue_entropy(ms, T, pH), result["residue_entropy"])
+
+
+def test_weights_at_simulation_conditions_are_normalized_counts(ms):
+    counts = np.array([m.count for m in ms.microstates])
+    expected = counts / counts.sum()
+    assert np.allclose(stats.get_weights(ms), expected)
+    assert np.allclose(stats.get_weights(ms, ms.T, ms.pH), expected)
+    assert np.allclose(stats.get_energies(ms, pH=ms.pH), [m.E for m in ms.microstates])
+
+
+def test_titration_stats(ms):
+    titration = stats.titration_stats([ms, ms])
+    single = stats.ensemble_stats(ms)
+    assert np.allclose(titration["average_energy"], single["average_energy"])
+    assert set(titration["residue_entropy"]) == set(ms.free_residue_names)
+
+
+@pytest.mark.parametrize(
+    "ms_T, T, pH, shift_per_proton",
+    [
+        # 1.364 * 290 / 298.15 * (4.5 - 5.0):
+        (cst.ROOMT, 290.0, 4.5, -0.6633574),
+        # 1.364 * 310 / 298.15 * (6.0 - 5.0), T defaults to ms.T:
+        (310.0, None, 6.0, 1.4182123),
+        (cst.ROOMT, None, 6.0, 1.364),
+    ],
+)
+def test_ph_shift_at_temperature(ms, ms_T, T, pH, shift_per_proton):
+    ms.T = ms_T
+    nh = [sum(ms.conformers[ic].nh for ic in m.state()) for m in ms.microstates]
+    shift = stats.get_energies(ms, T, pH) - [m.E for m in ms.microstates]
+    assert np.allclose(shift, np.array(nh) * shift_per_proton, atol=1e-6)
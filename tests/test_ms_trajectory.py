@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from mccesk import base
+from mccesk import ms_trajectory as mt
+
+
+def replay(ms: base.MS) -> tuple:
+    """Brute-force replay of the MC file: (energies, counts, states)."""
+
+    energies, counts, states = [], [], []
+    with open(ms.msout_file_dir.joinpath(f"MC{ms.selected_MC}")) as fh:
+        for nl, line in enumerate(fh):
+            if nl == 0:
+                state = [int(c) for c in line.split(":")[1].split()]
+                continue
+            fields = line.split(",")
+            if len(fields) >= 3:
+                for ic in [int(c) for c in fields[2].split()]:
+                    state[ms.ires_by_iconf[ic]] = ic
+                energies.append(float(fields[0]))
+                counts.append(int(fields[1]))
+                states.append(list(state))
+
+    return np.array(energies), np.array(counts), np.array(states)
+
+
+# MC run 2 is followed by a blank line in the msout file:
+@pytest.mark.parametrize("ms", [2], indirect=True)
+@pytest.mark.parametrize("checkpoint_interval", [1, 7, 100, 10**6])
+def test_states_match_replay(ms, checkpoint_interval):
+    energies, counts, states = replay(ms)
+    traj = mt.MCTrajectory(ms, checkpoint_interval)
+
+    assert len(traj) == len(states)
+    assert np.array_equal(traj.energies, energies)
+    assert np.array_equal(traj.counts, counts)
+    for i in list(range(0, len(states), 13)) + [len(states) - 1, -1]:
+        assert np.array_equal(traj.state(i), states[i])
+    assert np.array_equal(traj[-1], states[-1])
+    with pytest.raises(IndexError):
+        traj.state(len(states))
+
+    for i, (E, count, state) in enumerate(traj):
+        assert E == energies[i] and count == counts[i]
+        assert np.array_equal(state, states[i])
+    window = [state.copy() for _, _, state in traj.iter_states(95, 130)]
+    assert np.array_equal(window, states[95:130])
+
+
+@pytest.mark.parametrize("ms", [2], indirect=True)
+def test_series_match_replay(ms):
+    _, _, states = replay(ms)
+    traj = mt.MCTrajectory(ms)
+    for ires in range(states.shape[1]):
+        assert np.array_equal(traj.residue_series(ires), states[:, ires])
+
+    crg = np.array([conf.crg for conf in ms.conformers])
+    assert np.allclose(traj.charge_series(), crg[states].sum(axis=1))
+
+
+@pytest.mark.parametrize("ms", [2], indirect=True)
+def test_weighted_autocorrelation_matches_expanded_series(ms):
+    traj = mt.MCTrajectory(ms)
+    series = traj.charge_series()
+    acf = mt.autocorrelation(series, traj.counts, max_lag=60)
+
+    x = np.repeat(series, traj.counts)
+    x = x - x.mean()
+    expected = np.array([np.dot(x[: len(x) - lag], x[lag:]) for lag in range(61)])
+    assert np.allclose(acf, expected / expected[0])
+
+    with pytest.raises(ValueError, match="max_lag"):
+        mt.autocorrelation(series, traj.counts)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_weighted_autocorrelation_all_lags(seed):
+    rng = np.random.default_rng(seed)
+    series = rng.normal(size=40)
+    counts = rng.integers(0, 8, size=40)  # records lasting 0 steps are skipped
+    acf = mt.autocorrelation(series, counts, max_lag=10**6)
+
+    x = np.repeat(series, counts)
+    x = x - x.mean()
+    expected = np.array([np.dot(x[: len(x) - lag], x[lag:]) for lag in range(len(x))])
+    assert np.allclose(acf, expected / expected[0])
+
+
+def test_record_autocorrelation():
+    x = np.array([1.0, 3.0, 2.0, 5.0, 4.0])
+    y = x - x.mean()
+    expected = np.array([np.dot(y[: len(y) - lag], y[lag:]) for lag in range(5)])
+    assert np.allclose(mt.autocorrelation(x), expected / expected[0])
+    # a record lasting one step each is the unweighted function:
+    assert np.allclose(
+        mt.autocorrelation(x, np.ones(5, dtype=int), max_lag=4), expected / expected[0]
+    )
+
+
+def test_transition_matrix_and_dwell_times():
+    series = np.array([1, 1, 2, 1, 2, 2])
+    counts = np.array([2, 1, 3, 1, 1, 2])
+    labels, matrix = mt.transition_matrix(series, counts, normalize=False)
+    assert labels.tolist() == [1, 2]
+    # record transitions 1->1, 1->2, 2->1, 1->2, 2->2, plus count - 1
+    # self-transitions: 1 + 0 + 0 for label 1, 2 + 0 + 1 for label 2:
+    assert matrix.tolist() == [[1 + 1, 2], [1, 1 + 3]]
+    _, normalized = mt.transition_matrix(series, counts)
+    assert np.allclose(normalized.sum(axis=1), 1)
+
+    values, durations = mt.dwell_times(series, counts)
+    assert values.tolist() == [1, 2, 1, 2]
+    assert durations.tolist() == [3, 3, 1, 3]